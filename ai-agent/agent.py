@@ -1,18 +1,31 @@
 import os
-import base64
 import asyncio
-import io
+import time
 import json
 
 from storage import ConversationCache
 from dotenv import load_dotenv
 from datetime import datetime
 from logger import logger
-from const import PAIRS_TO_FLUSH, LAST_N_PAIRS
+from const import PAIRS_TO_FLUSH, LAST_N_PAIRS, FLUSH_DRAIN_TIMEOUT
 from utils import ensure_user_exists
-from PIL import Image
+from backend_client import aclose_http_client
+from flush_coalescer import get_coalescer
+from intent_router import intent_router
+from summary_cache import get_summary_cache
+from file_index import get_file_index
+from text_cache import get_text_cache
+from extraction import shutdown_process_pool
+from content_index import get_content_index
+from prefetch import Prefetcher, stats as prefetch_stats
+from read_aloud import ReadAloud
+from frame_sampler import FrameSampler
+from vision import prepare_frame_async, encode_image_async, shutdown_vision_pool, stats as vision_stats
+from vision_cache import VisionAnswerCache
+from chat_context import ChatContextManager
+from context_builder import load_encoding_async, stats as prompt_stats
 from typing import Optional, Literal
-from functions import process_user_input, handle_image_description
+from functions import process_user_input_async, handle_image_description_async, pipeline_stats
 
 from livekit import agents
 from livekit import rtc
@@ -42,6 +55,9 @@ class Assistant(Agent):
             - **Vision:** If the user asks about what you see (e.g., "describe me", "what do you see?", "What is this?"), 
             you MUST call 'describe_camera_view' tool.
 
+            - **Continue Reading:** If the user asks to continue or resume reading a file that was interrupted,
+            call the 'continue_reading' tool.
+
             - **Time Tool:** If the user asks for the date or time, call 'get_current_date_and_time'.
             
             - **UI/Device Control:** ALWAYS call the 'control_ui_device' tool when the user asks to control a device or UI element, 
@@ -58,14 +74,19 @@ class Assistant(Agent):
         )
         self.context_pairs = []
         self.cache = None
+        self.prefetcher: Optional[Prefetcher] = None
+        self.reader = ReadAloud()
+        self.frame_sampler = FrameSampler()
+        self.vision_cache = VisionAnswerCache()
+        self.context_manager = ChatContextManager()
 
-    def update_context(self, username: str):
+    async def update_context(self, username: str):
         """Always keep the latest LAST_N_PAIRS context pairs."""
         if not self.cache:
             self.cache = ConversationCache(
                 username=username, pairs_to_flush=int(PAIRS_TO_FLUSH)
             )
-        new_pairs = self.cache.get_last_n_pairs(LAST_N_PAIRS)
+        new_pairs = await self.cache.get_last_n_pairs(LAST_N_PAIRS)
         self.context_pairs = new_pairs
 
     @function_tool
@@ -74,20 +95,28 @@ class Assistant(Agent):
         return datetime.now().strftime("Current date and time: %Y-%m-%d %H:%M:%S")
 
     @function_tool
-    async def process_file_request(self, ctx: RunContext, user_input: str) -> str:
+    async def process_file_request(self, ctx: RunContext, user_input: str) -> Optional[str]:
         """
         Finds and processes a pdf file based on a user's spoken request.
         This tool handles all logic for locating the file and extracting its content.
         Use this for any request to read, summarize, or query a document.
         The 'user_input' argument should be the user's complete, original request.
         """
+        started = time.perf_counter()
         try:
             context_pairs = self.context_pairs
-            result = process_user_input(user_input, context=context_pairs)
+            result = await process_user_input_async(user_input, context=context_pairs)
             print("Process file request result:", result)
+            if result.status != "done":
+                # file not found (with "Did you mean ..."), unsupported request
+                print(result.message)
+                return result.message
             if result.intent == "read raw text":
                 print(result.raw_text)
-                return f"I will read the file you requested: {result.raw_text}"
+                # spoken sentence by sentence by the session, no LLM pass over the whole text
+                chunks_left = self.reader.start(ctx.session, result.raw_text)
+                logger.info(f"Reading file aloud: {chunks_left} chunks")
+                return None
             elif result.intent == "read file and summary":
                 print(result.summary.summary)
                 return f"Summary of the file you requested: {result.summary.summary}"
@@ -97,7 +126,20 @@ class Assistant(Agent):
         except Exception as e:
             print(f"Error in process_file_request: {e}")
             return f"Error while processing: {e}"
+        finally:
+            if self.prefetcher:
+                self.prefetcher.record_first_request(time.perf_counter() - started)
     
+    @function_tool
+    async def continue_reading(self, ctx: RunContext) -> Optional[str]:
+        """
+        Continues reading the last file aloud from where the user interrupted it.
+        Use this when the user says "continue", "go on", "keep reading" or similar after a file was being read.
+        """
+        if self.reader.resume(ctx.session):
+            return None
+        return "There is no interrupted file to continue reading."
+
     @function_tool
     async def describe_camera_view(self, ctx: RunContext, user_input: str) -> str:
         """
@@ -106,55 +148,23 @@ class Assistant(Agent):
         The 'user_input' is the user's original question.
         """
         logger.info("describe_camera_view tool called.")
-        room = get_job_context().room
-        participant = next(iter(room.remote_participants.values()), None)
-        if not participant:
-            logger.warning("No remote participants found.")
-            return "I don't see anyone else in the room."
-
-        video_track_pub = next(
-            (pub for pub in participant.track_publications.values()
-            if pub.track and pub.track.kind == rtc.TrackKind.KIND_VIDEO),
-            None,
-        )
-
-        if not video_track_pub or not video_track_pub.track:
-            logger.warning("Participant found, but no video track.")
-            return "I am not receiving any video feed. Please ensure your camera is on."
-
-        video_stream = rtc.VideoStream(video_track_pub.track)
-        frame_to_process: Optional[rtc.VideoFrame] = None
-        try:
-            logger.info("Waiting for video frame...")
-            event = await asyncio.wait_for(anext(video_stream), timeout=2.0)
-            frame_to_process = event.frame
-            logger.info("Video frame received.")
-        
-        except asyncio.TimeoutError:
-            logger.warning("Timed out waiting for video frame in tool.")
-            return "I am not receiving any video feed. Please ensure your camera is on."
-        except Exception as e:
-            logger.error(f"Error getting frame from stream: {e}")
-            return "An error occurred while accessing the video stream."
-        finally:
-            await video_stream.aclose()
-
+        # frames come from the room's background sampler, no stream is opened per question
+        frame_to_process = await self.frame_sampler.latest()
         if frame_to_process is None:
-            logger.warning("Frame was None after stream.")
+            logger.warning("No recent video frame available.")
             return "I am not receiving any video feed. Please ensure your camera is on."
         try:
             logger.info("Processing frame...")
-            rgb_frame = frame_to_process.convert(rtc.VideoBufferType.RGB24)
-            img = Image.frombytes(
-                "RGB", (rgb_frame.width, rgb_frame.height), rgb_frame.data
-            )
-            buf = io.BytesIO()
-            img.save(buf, format="JPEG")
-            img_bytes = buf.getvalue()
-            base64_image = base64.b64encode(img_bytes).decode("utf-8")
-            
+            image, frame_hash = await prepare_frame_async(frame_to_process)
+            cached = self.vision_cache.get(frame_hash, user_input)
+            if cached is not None:
+                return cached
+            base64_image = await encode_image_async(image)
+
             logger.info("Calling OpenAI Vision API...")
-            return handle_image_description(user_input, base64_image)
+            answer = await handle_image_description_async(user_input, base64_image)
+            self.vision_cache.put(frame_hash, user_input, answer)
+            return answer
 
         except Exception as e:
             logger.error(f"Error in describe_camera_view: {e}")
@@ -204,14 +214,47 @@ class Assistant(Agent):
 async def entrypoint(ctx: agents.JobContext):
     """Entry point for the agent session."""
     username = LOGIN_USERNAME
-    
+    background_tasks = set()
+
+    def run_in_background(coro):
+        # keep a reference so the task is not garbage collected before it finishes
+        task = asyncio.create_task(coro)
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+        return task
+
+    async def open_indexes():
+        # Downloads index: loaded from disk off the event loop, then kept current by the watcher
+        file_index = await asyncio.to_thread(get_file_index)
+        file_index.start_watching()
+        # full-text index of Downloads, rebuilt incrementally in the extraction process pool
+        content_index = await asyncio.to_thread(get_content_index)
+        content_index.start()
+        return file_index, content_index
+
+    # the session starts without waiting for the indexes; an early file lookup waits in its worker thread
+    indexes_ready = run_in_background(open_indexes())
+    # tiktoken may download its BPE file on first use: load it in a thread, token counts are estimated until then
+    run_in_background(load_encoding_async())
+
     async def on_participant_connected(ctx: agents.JobContext, participant: rtc.RemoteParticipant):
         logger.info(f"Participant {participant.identity} joined the room")
+        # warm file index, OpenAI connection and recent PDFs while the history loads and the user says hello
+        if assistant.prefetcher:
+            assistant.prefetcher.cancel()
+        assistant.prefetcher = Prefetcher()
+        assistant.prefetcher.start(run_in_background)
+        # camera already published before the agent joined
+        for publication in participant.track_publications.values():
+            if publication.track and publication.track.kind == rtc.TrackKind.KIND_VIDEO:
+                assistant.frame_sampler.attach(publication.track, run_in_background)
         # Lấy context từ server
         temp_cache = ConversationCache(
             username=participant.identity, pairs_to_flush=int(PAIRS_TO_FLUSH)
         )
-        history_pairs = temp_cache.get_last_n_pairs(LAST_N_PAIRS)
+        # fetch history once; later turns are served from the cache's pair window
+        await temp_cache.load_history()
+        history_pairs = await temp_cache.get_last_n_pairs(LAST_N_PAIRS)
         initial_ctx = ChatContext()
         message_count = 0
         for pair in history_pairs:
@@ -222,21 +265,76 @@ async def entrypoint(ctx: agents.JobContext):
                 initial_ctx.add_message(role="assistant", content=pair["bot"])
                 message_count += 1
         logger.info(f"Loaded {message_count} messages into agent's ChatContext.")
+        if assistant.cache and assistant.cache is not temp_cache:
+            run_in_background(assistant.cache.aclose())
         assistant.cache = temp_cache
         assistant.context_pairs = history_pairs
 
         # Nạp vào agent
         await assistant.update_chat_ctx(initial_ctx)
-        assistant.update_context(assistant.cache.username)
+        assistant.context_manager.reset(initial_ctx)
+        await assistant.update_context(assistant.cache.username)
+
+    def on_track_subscribed(
+        track: rtc.Track, publication: rtc.RemoteTrackPublication, participant: rtc.RemoteParticipant
+    ):
+        if track.kind == rtc.TrackKind.KIND_VIDEO:
+            assistant.frame_sampler.attach(track, run_in_background)
+
+    def on_track_unsubscribed(
+        track: rtc.Track, publication: rtc.RemoteTrackPublication, participant: rtc.RemoteParticipant
+    ):
+        if track.kind == rtc.TrackKind.KIND_VIDEO:
+            assistant.frame_sampler.detach(track.sid)
 
     def on_participant_disconnected(participant: rtc.RemoteParticipant):
         logger.info(f"Participant disconnected: {participant.identity}")
-        assistant.cache.flush()  
+        if assistant.prefetcher:
+            assistant.prefetcher.cancel()
+        assistant.reader.stop()
+        assistant.context_manager.cancel()
+        for publication in participant.track_publications.values():
+            assistant.frame_sampler.detach(publication.sid)
+        if assistant.cache:
+            # drain in background, the room event callback must stay sync
+            run_in_background(assistant.cache.aclose())
+            assistant.cache = None
+
+    async def on_shutdown():
+        if assistant.cache:
+            await assistant.cache.aclose()
+        try:
+            file_index, content_index = await indexes_ready
+            await content_index.stop()
+            await file_index.stop_watching()
+            await asyncio.to_thread(file_index.save)
+        except Exception as e:
+            logger.warning(f"File indexes were not opened: {e}")
+        assistant.frame_sampler.detach()
+        if background_tasks:
+            await asyncio.gather(*background_tasks, return_exceptions=True)
+        await get_coalescer().aclose(FLUSH_DRAIN_TIMEOUT)
+        await aclose_http_client()
+        shutdown_process_pool()
+        shutdown_vision_pool()
+        logger.info(f"Intent router stats: {intent_router.stats()}")
+        logger.info(f"Summary cache stats: {get_summary_cache().stats()}")
+        logger.info(f"Text cache stats: {get_text_cache().stats()}")
+        logger.info(f"First file request latency: {prefetch_stats()}")
+        logger.info(f"File request pipeline: {pipeline_stats()}")
+        logger.info(f"Camera frame sampler: {assistant.frame_sampler.stats()}")
+        logger.info(f"Vision preprocessing: {vision_stats()}")
+        logger.info(f"Vision answer cache: {assistant.vision_cache.stats()}")
+        logger.info(f"Agent ChatContext: {assistant.context_manager.stats()}")
+        logger.info(f"Prompt tokens / cached prefix: {prompt_stats()}")
 
     ctx.add_participant_entrypoint(entrypoint_fnc=on_participant_connected)
     ctx.room.on("participant_disconnected", on_participant_disconnected)
+    ctx.room.on("track_subscribed", on_track_subscribed)
+    ctx.room.on("track_unsubscribed", on_track_unsubscribed)
+    ctx.add_shutdown_callback(on_shutdown)
     
-    if not ensure_user_exists(username):
+    if not await ensure_user_exists(username):
         logger.error(
             "Cannot initialize assistant because user registration/login failed."
         )
@@ -261,14 +359,18 @@ async def entrypoint(ctx: agents.JobContext):
 
     @session.on("conversation_item_added")
     def on_conversation_item_added(event: ConversationItemAddedEvent):
+        # the session has already appended the item to the agent's ChatContext; only keep it within budget
+        assistant.context_manager.on_item_added(assistant, event.item, run_in_background)
+
         async def async_handler():
             role = event.item.role
             text_contents = event.item.text_content
             print(
                 f"Conversation item added from {role}: {text_contents}. interrupted: {event.item.interrupted}"
             )
-
-            new_ctx = assistant.chat_ctx.copy()
+            if not assistant.cache:
+                # participant already left and its cache has been drained
+                return
 
             for content in event.item.content:
                 if isinstance(content, str):
@@ -280,18 +382,16 @@ async def entrypoint(ctx: agents.JobContext):
                         # AGENT response text
                         logger.info(f"[AGENT] {content}")
                         assistant.cache.add_agent_message(content)
-                    new_ctx.add_message(role=role, content=content)
                 elif isinstance(content, ImageContent):
                     print(f" - image: {content.image}")
                 elif isinstance(content, AudioContent):
                     print(
                         f" - audio: {content.frame}, transcript: {content.transcript}"
                     )
-            await assistant.update_chat_ctx(new_ctx)
-            assistant.update_context(assistant.cache.username)
+            await assistant.update_context(assistant.cache.username)
             print("Updated context pairs:", assistant.context_pairs)
 
-        asyncio.create_task(async_handler())
+        run_in_background(async_handler())
 
     # @session.on("close")
     # def on_session_close():
@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import base64
+import asyncio
+import httpx
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+from logger import logger
+from const import (
+    BACKEND_TIMEOUT,
+    BACKEND_MAX_CONNECTIONS,
+    TOKEN_DEFAULT_TTL,
+    TOKEN_REFRESH_MARGIN,
+)
+
+load_dotenv()
+
+BACKEND_BASE = os.getenv("BACKEND_BASE_URL")
+BACKEND_INGEST_KEY = os.getenv("BACKEND_INGEST_KEY")  # Ingest:ApiKey of the backend, enables bulk flush
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide keep-alive connection pool shared by every backend call."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=BACKEND_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=BACKEND_MAX_CONNECTIONS,
+                max_keepalive_connections=BACKEND_MAX_CONNECTIONS,
+            ),
+        )
+    return _http_client
+
+
+async def aclose_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def jwt_expiry(token: str) -> Optional[float]:
+    """Read the `exp` claim (epoch seconds) of a JWT without verifying it. None if missing/unreadable."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims["exp"])
+    except Exception:
+        return None
+
+
+def token_from_response(data) -> Optional[str]:
+    # backend returns { Message, User: { Username, Token } } per controller
+    if isinstance(data, dict):
+        u = data.get("User") or data.get("user") or {}
+        return u.get("Token") or u.get("token")
+    return None
+
+
+class CredentialManager:
+    """
+    Cache backend tokens per username for the whole process.
+    Tokens are reused until shortly before their JWT `exp`; concurrent callers share one in-flight login.
+    """
+    def __init__(self, refresh_margin: float = TOKEN_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self._tokens: Dict[str, Tuple[str, float]] = {}  # username -> (token, expires_at)
+        self._logins: Dict[str, asyncio.Task] = {}
+        self.login_count = 0
+
+    def store(self, username: str, token: str):
+        expires_at = jwt_expiry(token) or time.time() + TOKEN_DEFAULT_TTL
+        self._tokens[username] = (token, expires_at)
+
+    def invalidate(self, username: str):
+        self._tokens.pop(username, None)
+
+    async def _login(self, username: str) -> str:
+        self.login_count += 1
+        resp = await get_http_client().post(
+            f"{BACKEND_BASE}/api/account/login", json={"username": username}
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        token = token_from_response(data)
+        if not token:
+            raise RuntimeError("Login did not return token. Response: " + str(data))
+        self.store(username, token)
+        return token
+
+    async def get_token(self, username: str) -> str:
+        cached = self._tokens.get(username)
+        if cached and time.time() < cached[1] - self.refresh_margin:
+            return cached[0]
+        task = self._logins.get(username)
+        if task is None:
+            task = asyncio.create_task(self._login(username))
+            self._logins[username] = task
+            task.add_done_callback(lambda _: self._logins.pop(username, None))
+        # shield: one caller being cancelled must not cancel the login the others wait on
+        return await asyncio.shield(task)
+
+    async def auth_headers(self, username: str) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {await self.get_token(username)}"}
+
+
+credentials = CredentialManager()
+
+
+async def request_as(username: str, method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Authenticated backend request on the shared pool.
+    Retries once with a fresh login if backend rejects the cached token.
+    """
+    client = get_http_client()
+    extra_headers = kwargs.pop("headers", None) or {}
+    headers = {**extra_headers, **await credentials.auth_headers(username)}
+    resp = await client.request(method, url, headers=headers, **kwargs)
+    if resp.status_code == 401:
+        logger.info(f"Token rejected for '{username}', logging in again.")
+        credentials.invalidate(username)
+        headers = {**extra_headers, **await credentials.auth_headers(username)}
+        resp = await client.request(method, url, headers=headers, **kwargs)
+    return resp
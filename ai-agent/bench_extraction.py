@@ -0,0 +1,92 @@
+"""
+Benchmark: PDF text extraction, previous read_file_content loop vs extraction.py (serial and process pool).
+Generates 10-, 100- and 1000-page PDFs in a temp dir. Run: python bench_extraction.py [pages ...]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+from PyPDF2 import PdfReader
+from extraction import extract_text, get_process_pool, shutdown_process_pool
+
+LINES_PER_PAGE = 45
+
+
+def make_pdf(path: str, pages: int):
+    """Minimal uncompressed PDF with LINES_PER_PAGE lines of Helvetica text per page."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for p in range(pages):
+        lines = " T* ".join(
+            f"(Page {p + 1} line {i + 1}: quarterly budget review and project status notes.) Tj"
+            for i in range(LINES_PER_PAGE)
+        )
+        stream = f"BT /F1 10 Tf 12 TL 40 760 Td {lines} ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % pages
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def old_extract(filepath: str, max_chars: int) -> str:
+    """Previous read_file_content PDF branch."""
+    text_content = ""
+    reader = PdfReader(filepath)
+    for page in reader.pages:
+        page_text = page.extract_text() or ""
+        text_content += page_text
+        if len(text_content) > max_chars:
+            text_content = text_content[:max_chars]
+            break
+    return text_content
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10, 100, 1000]
+    workdir = tempfile.mkdtemp(prefix="bench_pdf_")
+    try:
+        # start the pool processes before timing
+        get_process_pool().submit(len, "").result()
+        print(f"cpu_count={os.cpu_count()} (the pool column equals serial on a single core)")
+        print(f"{'pages':>6} {'budget':>9} {'old ms':>10} {'serial ms':>10} {'pool ms':>10}")
+        for pages in sizes:
+            path = os.path.join(workdir, f"doc_{pages}.pdf")
+            make_pdf(path, pages)
+            for budget in (8000, None):
+                old, old_ms = timed(lambda: old_extract(path, budget if budget else 10**12))
+                (serial, _), serial_ms = timed(lambda: extract_text(path, budget, parallel=False))
+                (pooled, _), pool_ms = timed(lambda: extract_text(path, budget, parallel=True))
+                assert old == serial == pooled
+                label = budget if budget else "all"
+                print(f"{pages:>6} {label:>9} {old_ms:>10.1f} {serial_ms:>10.1f} {pool_ms:>10.1f}")
+    finally:
+        shutdown_process_pool()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: Downloads lookups with os.walk (previous utils code) vs FileIndex, over a synthetic tree.
+Run: python bench_file_index.py [files]   (default 100000 files in 1000 folders, created in a temp dir)
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from file_index import FileIndex
+
+FILES = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+PER_DIR = 100
+EXTS = [".pdf", ".docx", ".txt", ".png", ".zip"]
+
+
+def walk_find(root: str, filename: str):
+    """Previous find_file_in_downloads."""
+    for dirpath, _, files in os.walk(root):
+        for f in files:
+            if f.lower() == filename.lower():
+                return os.path.join(dirpath, f)
+    return None
+
+
+def walk_recent_pdfs(root: str, days: int = 7):
+    """Previous find_recent_pdfs_in_downloads."""
+    recent_files = []
+    cutoff_time = datetime.now() - timedelta(days=days)
+    for dirpath, _, files in os.walk(root):
+        for f in files:
+            if f.lower().endswith(".pdf"):
+                file_path = os.path.join(dirpath, f)
+                modified_time = datetime.fromtimestamp(os.path.getmtime(file_path))
+                if modified_time >= cutoff_time:
+                    recent_files.append({"file_name": f, "full_path": file_path, "modified_time": modified_time})
+    recent_files.sort(key=lambda x: x["modified_time"], reverse=True)
+    return recent_files
+
+
+def make_tree(root: str):
+    rng = random.Random(42)
+    now = time.time()
+    for i in range(FILES):
+        d = os.path.join(root, f"dir{i // PER_DIR:04d}", "sub" if i % 3 == 0 else "")
+        os.makedirs(d, exist_ok=True)
+        path = os.path.join(d, f"file_{i}{EXTS[i % len(EXTS)]}")
+        with open(path, "wb"):
+            pass
+        t = now - rng.uniform(0, 60 * 86400)
+        os.utime(path, (t, t))
+
+
+def timed(label: str, fn, repeat: int = 1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{label:<40} {elapsed * 1000:10.3f} ms")
+    return result
+
+
+def main():
+    root = tempfile.mkdtemp(prefix="bench_downloads_")
+    index_path = os.path.join(root + "_index", "file_index.json")
+    try:
+        print(f"Creating {FILES} files under {root} ...")
+        make_tree(root)
+        target = f"FILE_{FILES - 1}{EXTS[(FILES - 1) % len(EXTS)]}"
+
+        walk_path = timed("os.walk find (old)", lambda: walk_find(root, target))
+        walk_recent = timed("os.walk recent pdfs (old)", lambda: walk_recent_pdfs(root))
+
+        index = FileIndex(root=root, path=index_path)
+        timed("index cold build", index.refresh)
+        index._dirty = True
+        timed("index save", index.save)
+        loaded = timed("index load from disk", lambda: FileIndex(root=root, path=index_path))
+        timed("trigram index build (first fuzzy query)", loaded._build_grams)
+        timed("index no-op rescan", index.refresh, repeat=5)
+        index_path_found = timed("index find", lambda: index.find(target), repeat=1000)
+        cutoff = (datetime.now() - timedelta(days=7)).timestamp()
+        index_recent = timed("index recent pdfs", lambda: index.recent(since=cutoff), repeat=100)
+        timed("index 3rd most recent pdf", lambda: index.recent(limit=3)[-1], repeat=1000)
+        # every synthetic name shares "file_": worst case for the trigram postings
+        spoken = f"file {FILES // 2}"
+        index._build_grams()
+        fuzzy = timed(f"index fuzzy find '{spoken}'", lambda: index.fuzzy_find(spoken), repeat=20)
+        print(f"{'':<40} best: {os.path.basename(fuzzy[0][1])} ({fuzzy[0][0]})")
+
+        # one new download, then the incremental rescan
+        new_file = os.path.join(root, "dir0001", "new_report.pdf")
+        open(new_file, "wb").close()
+        timed("index rescan after 1 new file", index.refresh)
+
+        assert walk_path == index_path_found
+        assert [f["full_path"] for f in walk_recent] == [f["full_path"] for f in index_recent]
+        assert index.find("NEW_REPORT.PDF") == new_file
+        print("Results match.")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        shutil.rmtree(os.path.dirname(index_path), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Memory benchmark: bytes per session of the conversation context layout.
+Compares the previous layout (CreateMessageDto dicts with ISO timestamps + copied {"user", "bot"} dicts)
+with StoredMessage/PairView from records.py. Run: python bench_memory.py
+"""
+import tracemalloc
+from collections import deque
+from datetime import datetime, timezone
+from records import StoredMessage, PairView, USER, BOT
+from const import LAST_N_PAIRS
+
+CONTENT_CHARS = 80
+
+
+def make_texts(session: int):
+    return [f"session {session} message {i} ".ljust(CONTENT_CHARS, "x") for i in range(2 * LAST_N_PAIRS)]
+
+
+def dict_layout(texts):
+    """Previous layout: pending dicts + pairs rebuilt as new dicts (+ a copy in Assistant.context_pairs)."""
+    messages = [
+        {
+            "senderType": i % 2,
+            "content": text,
+            "createdAt": datetime.now(timezone.utc).isoformat(),
+        }
+        for i, text in enumerate(texts)
+    ]
+    pairs = [
+        {"user": messages[i]["content"], "bot": messages[i + 1]["content"]}
+        for i in range(0, len(messages) - 1, 2)
+    ]
+    context_pairs = [dict(p) for p in pairs]
+    return messages, pairs, context_pairs
+
+
+def compact_layout(texts):
+    """New layout: slotted messages with epoch-ms timestamps, pairs are views in a ring buffer."""
+    window = deque(maxlen=LAST_N_PAIRS)
+    open_user = None
+    for i, text in enumerate(texts):
+        message = StoredMessage.now(USER if i % 2 == 0 else BOT, text)
+        if message.sender_type == USER:
+            open_user = message
+        else:
+            window.append(PairView(open_user, message))
+    context_pairs = list(window)  # Assistant.context_pairs shares the same views
+    return window, context_pairs
+
+
+def measure(build, sessions: int) -> float:
+    texts = [make_texts(s) for s in range(sessions)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(t) for t in texts]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / sessions
+
+
+def main():
+    text_bytes = sum(len(t) for t in make_texts(0)) + 49 * 2 * LAST_N_PAIRS
+    print(f"{2 * LAST_N_PAIRS} messages/session, {CONTENT_CHARS}-char texts (~{text_bytes} B of text, not counted below)")
+    for sessions in (1_000, 10_000):
+        old = measure(dict_layout, sessions)
+        new = measure(compact_layout, sessions)
+        print(
+            f"{sessions:>6} sessions: dict layout {old:8.0f} B/session | compact {new:8.0f} B/session "
+            f"| saved {100 * (1 - new / old):.0f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark: camera frame -> base64 JPEG, previous full-size encode vs vision.py downsampling, at several resolutions.
+Reports encode time and payload size; with --live also the end-to-end vision call (needs OPENAI_API_KEY).
+Run: python bench_vision.py [--live]
+"""
+import io
+import sys
+import time
+import base64
+import asyncio
+import numpy as np
+from PIL import Image
+from vision import encode_rgb
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080), (3840, 2160)]
+MAX_EDGES = [0, 1024, 768, 512]  # 0 = full size through the new pipeline
+REPEAT = 10
+QUESTION = "What do you see in this picture?"
+
+
+def make_frame(width: int, height: int) -> bytes:
+    """Camera-like RGB24 frame: smooth gradients, a few flat objects and sensor noise."""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    img = np.stack([x / width * 200, y / height * 180, (x + y) / (width + height) * 160 + 40], axis=-1)
+    for _ in range(12):
+        x0, y0 = rng.integers(0, width), rng.integers(0, height)
+        img[y0:y0 + height // 6, x0:x0 + width // 8] = rng.integers(0, 255, 3)
+    img += rng.normal(0, 6, img.shape)
+    return np.clip(img, 0, 255).astype(np.uint8).tobytes()
+
+
+def old_encode(width: int, height: int, data: bytes) -> str:
+    """Previous describe_camera_view code: full-size frame, default JPEG settings."""
+    img = Image.frombytes("RGB", (width, height), data)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG")
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
+
+
+def timed(fn, repeat: int = REPEAT):
+    result = fn()  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - started) / repeat * 1000
+
+
+async def vision_call(base64_image: str) -> float:
+    from functions import handle_image_description_async
+
+    started = time.perf_counter()
+    await handle_image_description_async(QUESTION, base64_image)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    live = "--live" in sys.argv
+    header = f"{'frame':>10} {'pipeline':>10} {'encode ms':>10} {'payload KB':>11}"
+    print(header + (f" {'vision ms':>10}" if live else ""))
+    for width, height in RESOLUTIONS:
+        data = make_frame(width, height)
+        rows = [("old", lambda: old_encode(width, height, data))]
+        for edge in MAX_EDGES:
+            rows.append((f"edge={edge or 'full'}", lambda edge=edge: encode_rgb(width, height, data, max_edge=edge)))
+        for label, fn in rows:
+            encoded, ms = timed(fn)
+            line = f"{f'{width}x{height}':>10} {label:>10} {ms:>10.1f} {len(encoded) / 1024:>11.1f}"
+            if live:
+                line += f" {asyncio.run(vision_call(encoded)):>10.0f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
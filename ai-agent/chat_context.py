@@ -0,0 +1,149 @@
+import time
+import asyncio
+from typing import Awaitable, Callable, Coroutine, Dict, List, Optional
+from livekit.agents import Agent
+from livekit.agents.llm import ChatContext, ChatMessage
+from logger import logger
+from metrics import LatencyStat, ValueStat
+from functions import summarize_conversation_async
+from context_builder import count_tokens
+from const import CHAT_CTX_TOKEN_BUDGET, CHAT_CTX_KEEP_FRACTION
+
+SUMMARY_MESSAGE_ID = "conversation_summary"
+
+
+def item_text(item) -> str:
+    """Text of a ChatContext item as the LLM sees it."""
+    if item.type == "message":
+        return item.text_content or ""
+    if item.type == "function_call":
+        return f"{item.name}({item.arguments})"
+    if item.type == "function_call_output":
+        return item.output
+    return ""
+
+
+def _is_system(item) -> bool:
+    return item.type == "message" and item.role in ("system", "developer")
+
+
+class ChatContextManager:
+    """
+    Keeps the agent's ChatContext within a token budget without copying it on every turn.
+    The session already appends each conversation item to the agent's context; the manager only counts
+    its tokens (once per item). When the context grows past token_budget, the oldest turns are folded in the
+    background into a rolling summary message and the context is replaced once, keeping the newest turns
+    up to keep_fraction of the budget.
+    """
+    def __init__(
+        self,
+        summarize: Callable[[str, str], Awaitable[str]] = summarize_conversation_async,
+        token_budget: int = CHAT_CTX_TOKEN_BUDGET,
+        keep_fraction: float = CHAT_CTX_KEEP_FRACTION,
+    ):
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.keep_tokens = int(token_budget * keep_fraction)
+        self.summary = ""
+        self.total = 0
+        self._tokens: Dict[str, int] = {}  # item id -> estimated tokens
+        self._fold_task: Optional[asyncio.Task] = None
+        self.folded_items = 0
+        self.context_tokens = ValueStat("chat_ctx_tokens")  # context size after each turn
+        self.maintenance = LatencyStat("chat_ctx_maintenance")
+        self.fold_latency = LatencyStat("chat_ctx_fold")
+
+    def _count(self, item) -> int:
+        tokens = self._tokens.get(item.id)
+        if tokens is None:
+            tokens = self._tokens[item.id] = count_tokens(item_text(item))
+        return tokens
+
+    def reset(self, chat_ctx: ChatContext):
+        """Start over from a freshly loaded context (participant joined)."""
+        self.cancel()
+        self._tokens.clear()
+        self.summary = ""
+        self.total = sum(self._count(item) for item in chat_ctx.items)
+
+    def cancel(self):
+        if self._fold_task is not None and not self._fold_task.done():
+            self._fold_task.cancel()
+        self._fold_task = None
+
+    def on_item_added(
+        self, agent: Agent, item, spawn: Callable[[Coroutine], asyncio.Task] = asyncio.create_task
+    ):
+        """Account for an item the session just added; schedules a fold when over budget. O(1) per item."""
+        started = time.perf_counter()
+        self.total += self._count(item)
+        self.context_tokens.observe(self.total)
+        if self.total > self.token_budget and (self._fold_task is None or self._fold_task.done()):
+            self._fold_task = spawn(self._fold(agent))
+        self.maintenance.observe(time.perf_counter() - started)
+
+    def _items_to_fold(self, items: List) -> List:
+        """Oldest turns until the rest fits keep_tokens; cut before a user message so tool calls stay with their turn."""
+        turns = [item for item in items if not _is_system(item)]
+        last_user = max(
+            (i for i, item in enumerate(turns) if item.type == "message" and item.role == "user"), default=0
+        )
+        remaining = sum(self._count(item) for item in turns)
+        cut = 0
+        for i, item in enumerate(turns[:last_user]):
+            if remaining <= self.keep_tokens and item.type == "message" and item.role == "user":
+                break
+            remaining -= self._count(item)
+            cut = i + 1
+        return turns[:cut]
+
+    async def _fold(self, agent: Agent):
+        started = time.perf_counter()
+        to_fold = self._items_to_fold(agent.chat_ctx.items)
+        if not to_fold:
+            return
+        transcript = "\n".join(
+            f"{getattr(item, 'role', item.type)}: {item_text(item)}" for item in to_fold if item_text(item)
+        )
+        try:
+            summary = await self.summarize(self.summary, transcript)
+        except Exception as e:
+            logger.error(f"Could not summarize older conversation turns: {e}")
+            return
+
+        # items added while summarizing are kept: only the folded ones are removed
+        folded = {item.id for item in to_fold}
+        kept = [
+            item for item in agent.chat_ctx.copy().items
+            if item.id not in folded and item.id != SUMMARY_MESSAGE_ID
+        ]
+        position = next((i for i, item in enumerate(kept) if not _is_system(item)), len(kept))
+        kept.insert(
+            position,
+            ChatMessage(
+                id=SUMMARY_MESSAGE_ID,
+                role="system",
+                content=[f"Summary of the earlier conversation: {summary}"],
+            ),
+        )
+        await agent.update_chat_ctx(ChatContext(kept))
+
+        self.summary = summary
+        for item_id in folded:
+            self._tokens.pop(item_id, None)
+        self._tokens.pop(SUMMARY_MESSAGE_ID, None)
+        self.total = sum(self._count(item) for item in kept)
+        self.folded_items += len(folded)
+        self.fold_latency.observe(time.perf_counter() - started)
+        logger.info(
+            f"Folded {len(folded)} items into the conversation summary, "
+            f"context now ~{self.total} tokens ({self.fold_latency.last:.2f}s)"
+        )
+
+    def stats(self) -> Dict:
+        return {
+            "context_tokens": self.context_tokens.snapshot(),
+            "maintenance": self.maintenance.snapshot(),
+            "fold": self.fold_latency.snapshot(),
+            "folded_items": self.folded_items,
+        }
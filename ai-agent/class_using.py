@@ -13,6 +13,17 @@ class RequestType(BaseModel):
     file_name: Optional[str] = Field(description="Name of the file if applicable")
     nth_file: Optional[int] = Field(description="Nth file if applicable")
 
+class RouteAndSummarize(BaseModel):
+    """Fused pipeline call: confirm the request type and, for summary requests, summarize in the same call."""
+
+    request_type: Literal["read file and summary", "read raw text", "unsupported"] = Field(
+        description="Type of request being made"
+    )
+    confidence_score: float = Field(description="Confidence score between 0 and 1")
+    summary: Optional[str] = Field(
+        description="Summary of the file text if request_type is 'read file and summary', otherwise null"
+    )
+
 class Summarize(BaseModel):
     """Response model for text summarization."""
     
@@ -1,7 +1,32 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 import os
+import asyncio
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
+from typing import List, Optional
 from dotenv import load_dotenv
+from const import LLM_TIMEOUT, MAX_CONCURRENT_LLM_CALLS
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
\ No newline at end of file
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# Async client for code running on the agent's event loop (tools), shared by the whole worker
+async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=LLM_TIMEOUT)
+_llm_slots = asyncio.Semaphore(MAX_CONCURRENT_LLM_CALLS)
+# LLM calls made by the current request (set by process_user_input_async), None outside a request
+llm_call_counter: ContextVar[Optional[List[int]]] = ContextVar("llm_call_counter", default=None)
+
+
+@asynccontextmanager
+async def llm_slot(timeout: float = LLM_TIMEOUT):
+    """
+    Hold one of the worker's LLM call slots. The deadline covers waiting for the slot and the call itself;
+    cancellation (user interrupted the tool) propagates into the in-flight request.
+    """
+    counter = llm_call_counter.get()
+    if counter is not None:
+        counter[0] += 1
+    async with asyncio.timeout(timeout):
+        async with _llm_slots:
+            yield
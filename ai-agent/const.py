@@ -3,6 +3,101 @@ import pathlib
 MODEL = "gpt-4o-mini"
 MODEL_TTS = "gpt-4o-mini-tts"
 OUTPUT_DIR = "speech_output"
+CACHE_DIR = "cache"
 DOWNLOADS_PATH = str(pathlib.Path.home() / "Downloads")
 PAIRS_TO_FLUSH = 5
-LAST_N_PAIRS = 5
\ No newline at end of file
+LAST_N_PAIRS = 5
+LLM_TIMEOUT = 30  # seconds per LLM call from the async tool path, including waiting for a slot
+MAX_CONCURRENT_LLM_CALLS = 8  # per worker
+
+# Backend / conversation flush
+BACKEND_TIMEOUT = 10  # seconds per backend request
+BACKEND_MAX_CONNECTIONS = 100  # shared keep-alive pool size for all backend calls of the worker
+TOKEN_REFRESH_MARGIN = 60  # seconds before JWT exp when the token is refreshed
+TOKEN_DEFAULT_TTL = 3600  # seconds, used when the token has no readable exp claim
+FLUSH_DRAIN_TIMEOUT = 10  # seconds to drain pending messages on disconnect/shutdown
+JOURNAL_PATH = str(pathlib.Path(CACHE_DIR) / "journal.sqlite3")
+BULK_BATCH_SIZE = 200  # worker-level batch: send as soon as this many messages are waiting
+BULK_MAX_DELAY = 2.0  # seconds a flush request may wait to be coalesced with other sessions
+HISTORY_MAX_PAGES = 3  # pages fetched back with the `before` cursor when seeding context pairs
+HISTORY_PAGE_CACHE_SIZE = 256  # history pages kept with their ETag for conditional requests
+
+# Intent routing
+INTENT_CACHE_SIZE = 512  # LRU entries of LLM routing results (normalized input + context hash)
+INTENT_LOCAL_CONFIDENCE = 0.85  # local classifier results below this go to the LLM router
+
+# Summary cache
+SUMMARY_CACHE_PATH = str(pathlib.Path(CACHE_DIR) / "summaries.sqlite3")
+SUMMARY_CACHE_MAX_ENTRIES = 2000
+SUMMARY_CACHE_MAX_BYTES = 20 * 1024 * 1024  # total size of stored summaries
+
+# Downloads file index
+FILE_INDEX_PATH = str(pathlib.Path(CACHE_DIR) / "file_index.json")
+FILE_INDEX_RESCAN_INTERVAL = 2.0  # seconds between directory-mtime rescans when no watcher is running
+FILE_INDEX_SAVE_INTERVAL = 60  # seconds between writes of the index to disk (always written on shutdown)
+
+# Extracted text cache (PDF/DOCX)
+TEXT_CACHE_DIR = str(pathlib.Path(CACHE_DIR) / "text")
+TEXT_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Document text extraction
+EXTRACT_PARALLEL_MIN_PAGES = 40  # smaller PDFs are extracted on the calling thread
+EXTRACT_PAGES_PER_TASK = 16  # pages per process-pool task
+EXTRACT_MAX_WORKERS = 4
+
+# Map-reduce summarization of long documents
+CHARS_PER_TOKEN = 4  # rough estimate used to size chunks
+SUMMARY_CHUNK_TOKENS = 2000  # one map/reduce call input
+SUMMARY_CHUNK_WORDS = 120  # length of each partial summary
+SUMMARY_MAP_CONCURRENCY = 4  # concurrent chunk summaries per document (also bounded by MAX_CONCURRENT_LLM_CALLS)
+LONG_DOC_MAX_CHARS = 400_000  # cap on text read for a map-reduce summary
+FUZZY_MIN_SCORE = 0.3  # trigram similarity below this is not a candidate
+FUZZY_AUTO_SELECT_SCORE = 0.6  # best candidate is used without asking when above this...
+FUZZY_AUTO_SELECT_MARGIN = 0.1  # ...and this far ahead of the second best
+FUZZY_STOP_GRAM_MIN = 1000  # trigrams in more names than this (and 5% of all) do not generate candidates
+
+# Full-text content index of the Downloads folder
+CONTENT_INDEX_PATH = str(pathlib.Path(CACHE_DIR) / "content_index.sqlite3")
+CONTENT_INDEX_INTERVAL = 30  # seconds between background sync passes
+CONTENT_INDEX_MAX_CHARS = 50_000  # text indexed per document
+SUPPORTED_EXTS = (".txt", ".md", ".csv", ".json", ".pdf", ".docx")
+
+# Join-time prefetch
+PREFETCH_FILES = 3  # most recent PDFs whose text is extracted when a participant joins (0 disables)
+PREFETCH_BUDGET = 15  # seconds the whole prefetch may take
+
+# Text-to-speech output
+TTS_VOICE = "alloy"
+TTS_CACHE_DIR = str(pathlib.Path(CACHE_DIR) / "tts")
+TTS_CHUNK_SIZE = 16 * 1024  # bytes written per streamed chunk
+
+# Reading documents aloud
+SPEECH_CHUNK_CHARS = 300  # sentences are grouped into chunks up to this size
+SPEECH_FIRST_CHUNK_CHARS = 120  # short first chunk: first audio does not depend on document length
+
+# File request pipeline
+FUSED_PIPELINE = True  # False: route first, then summarize (separate LLM calls), for comparison
+
+# Camera frames
+FRAME_SAMPLE_FPS = 2.0  # frames kept per second while the camera is in use
+FRAME_BUFFER_SIZE = 4  # recent frames in the ring buffer
+FRAME_IDLE_TIMEOUT = 30.0  # seconds without a frame request before only the newest frame is kept
+FRAME_MAX_AGE = 2.0  # older frames are not answered from the buffer (camera paused)
+FRAME_WAIT_TIMEOUT = 2.0  # seconds a request waits when no fresh frame is buffered
+
+# Vision requests
+VISION_MAX_EDGE = 768  # frames are reduced by an integer factor until the long edge (px) fits; 0 keeps full size
+VISION_JPEG_QUALITY = 75
+VISION_WORKERS = 2  # threads encoding frames (Pillow releases the GIL while resizing / encoding)
+VISION_CACHE_MAX_ENTRIES = 64
+VISION_CACHE_TTL = 60.0  # seconds a camera answer may be reused for a near-identical frame
+VISION_HASH_MAX_DISTANCE = 6  # differing dHash bits (of 64) still treated as the same scene
+
+# Agent ChatContext
+CHAT_CTX_TOKEN_BUDGET = 3000  # estimated tokens of conversation kept verbatim in the agent's ChatContext
+CHAT_CTX_KEEP_FRACTION = 0.6  # a fold keeps the newest turns up to this share of the budget
+CHAT_SUMMARY_WORDS = 120  # length of the rolling summary of folded turns
+
+# Prompt context
+CONTEXT_HISTORY_TOKENS = 1500  # conversation history packed into router / chat prompts
+CONTEXT_TURN_MAX_TOKENS = 300  # one user or assistant turn is cut to this before packing
@@ -0,0 +1,175 @@
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+from logger import logger
+from file_index import FileIndex, get_file_index
+from extraction import extract_for_index, get_process_pool
+from const import (
+    CONTENT_INDEX_PATH,
+    CONTENT_INDEX_INTERVAL,
+    CONTENT_INDEX_MAX_CHARS,
+    EXTRACT_MAX_WORKERS,
+    SUPPORTED_EXTS,
+)
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+# words of a spoken description that say nothing about the content
+_STOP_WORDS = {
+    "a", "an", "the", "about", "on", "of", "for", "to", "in", "with", "my", "me", "please", "can", "you",
+    "read", "open", "show", "summarize", "summary", "file", "pdf", "document", "doc", "docx", "one",
+    "that", "this", "is", "it", "and", "or", "from", "which", "what", "talks", "says", "mentions",
+}
+
+
+def to_match_query(description: str, match_all: bool = False) -> Optional[str]:
+    """
+    'the PDF about the budget' -> '"budget"*'; None when nothing searchable is left.
+    Terms are OR-ed, or AND-ed with match_all (every term must appear in the name or the text).
+    """
+    words = [w for w in _WORD.findall(description.lower()) if w not in _STOP_WORDS and len(w) > 1]
+    if not words:
+        return None
+    return (" AND " if match_all else " OR ").join(f'"{w}"*' for w in dict.fromkeys(words))
+
+
+class ContentIndex:
+    """
+    SQLite FTS5 index over the text of the supported files in the Downloads folder.
+    Maintained incrementally in the background: each pass compares the file index with what is indexed
+    (path, mtime, size) and extracts only new/changed documents, in the extraction process pool.
+    Lookups ("the PDF about the budget") are a single FTS query and never extract anything.
+    """
+    def __init__(self, file_index: FileIndex, path: str = CONTENT_INDEX_PATH):
+        self.file_index = file_index
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents (path TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+            "path UNINDEXED, name, body, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        self._task: Optional[asyncio.Task] = None
+        self.indexed = 0
+
+    # ---------- writes ----------
+    def _indexed_state(self) -> Dict[str, Tuple[float, int]]:
+        with self._lock:
+            return {path: (mtime, size) for path, mtime, size in self._conn.execute("SELECT path, mtime, size FROM documents")}
+
+    def _store(self, path: str, mtime: float, size: int, text: str):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM documents_fts WHERE path = ?", (path,))
+            self._conn.execute(
+                "INSERT INTO documents_fts (path, name, body) VALUES (?, ?, ?)",
+                (path, os.path.basename(path), text),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (path, mtime, size) VALUES (?, ?, ?)", (path, mtime, size)
+            )
+            self._conn.execute("COMMIT")
+
+    def _delete(self, paths: List[str]):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for path in paths:
+                self._conn.execute("DELETE FROM documents_fts WHERE path = ?", (path,))
+                self._conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+            self._conn.execute("COMMIT")
+
+    async def sync(self) -> int:
+        """One incremental pass. Returns the number of documents (re)indexed."""
+        files = await asyncio.to_thread(self.file_index.files, SUPPORTED_EXTS)
+        indexed = await asyncio.to_thread(self._indexed_state)
+        current = {path: (mtime, size) for path, mtime, size in files}
+        removed = [path for path in indexed if path not in current]
+        if removed:
+            await asyncio.to_thread(self._delete, removed)
+        changed = [(path, state) for path, state in current.items() if indexed.get(path) != state]
+        if not changed:
+            return 0
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        pool = get_process_pool()
+        semaphore = asyncio.Semaphore(min(EXTRACT_MAX_WORKERS, os.cpu_count() or 1))
+
+        async def index_one(path: str, state: Tuple[float, int]):
+            async with semaphore:
+                text = await loop.run_in_executor(pool, extract_for_index, path, CONTENT_INDEX_MAX_CHARS)
+            await asyncio.to_thread(self._store, path, state[0], state[1], text)
+
+        # newest files first: they are the ones users ask about
+        changed.sort(key=lambda item: item[1][0], reverse=True)
+        async with asyncio.TaskGroup() as tg:
+            for path, state in changed:
+                tg.create_task(index_one(path, state))
+        self.indexed += len(changed)
+        logger.info(
+            f"Content index: {len(changed)} documents indexed, {len(removed)} removed "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return len(changed)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Content index sync failed: {e}")
+            await asyncio.sleep(CONTENT_INDEX_INTERVAL)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---------- queries ----------
+    def search(self, description: str, limit: int = 5, match_all: bool = False) -> List[Tuple[float, str]]:
+        """(score, path) of documents matching a content description, best first (higher is better)."""
+        query = to_match_query(description, match_all)
+        if query is None:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                # file name hits weigh more than body hits
+                "SELECT path, bm25(documents_fts, 0.0, 5.0, 1.0) AS rank FROM documents_fts "
+                "WHERE documents_fts MATCH ? ORDER BY rank LIMIT ?",
+                (query, limit),
+            ).fetchall()
+        return [(round(-rank, 3), path) for path, rank in rows if os.path.exists(path)]
+
+    def close(self):
+        self._conn.close()
+
+
+_content_index: Optional[ContentIndex] = None
+
+
+def get_content_index() -> ContentIndex:
+    """Process-wide content index over the shared file index."""
+    global _content_index
+    if _content_index is None:
+        _content_index = ContentIndex(get_file_index())
+    return _content_index
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+from typing import Dict, List, Optional, Tuple
+from logger import logger
+from metrics import ValueStat
+from const import MODEL, CHARS_PER_TOKEN, CONTEXT_HISTORY_TOKENS, CONTEXT_TURN_MAX_TOKENS
+
+try:
+    import tiktoken
+except ImportError:
+    # declared in requirements; without it token counts are estimated from the length
+    logger.warning("tiktoken is not installed: token counts are approximate")
+    tiktoken = None
+
+# prompt tokens and share served from the provider's prefix cache, per call site
+prompt_tokens: Dict[str, ValueStat] = {}
+cached_ratio: Dict[str, ValueStat] = {}
+
+# model -> tiktoken encoding, None when it could not be loaded (estimate from the length)
+_encodings: Dict[str, Optional[object]] = {}
+_encodings_lock = threading.Lock()
+
+
+def load_encoding(model: str = MODEL):
+    """
+    Load the encoding of `model` once. The first load may download the BPE file (blocking HTTP),
+    so on the event loop use load_encoding_async at startup. Any failure falls back to the estimate.
+    """
+    with _encodings_lock:
+        if model in _encodings:
+            return _encodings[model]
+        encoding = None
+        if tiktoken is not None:
+            try:
+                try:
+                    encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                logger.warning(f"Could not load the tiktoken encoding for '{model}', token counts are approximate: {e}")
+        _encodings[model] = encoding
+        return encoding
+
+
+async def load_encoding_async(model: str = MODEL):
+    return await asyncio.to_thread(load_encoding, model)
+
+
+def _encoding(model: str):
+    if model in _encodings:
+        return _encodings[model]
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return load_encoding(model)  # no loop to stall
+    # on the event loop before load_encoding_async finished: estimate instead of downloading here
+    return None
+
+
+def count_tokens(text: str, model: str = MODEL) -> int:
+    """Exact with tiktoken, chars / CHARS_PER_TOKEN otherwise."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str = MODEL) -> str:
+    encoding = _encoding(model)
+    if encoding is None:
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        return text if len(text) <= max_chars else text[:max_chars] + "…"
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens]) + "…"
+
+
+def pack_history(
+    context: List[Dict],
+    budget: int = CONTEXT_HISTORY_TOKENS,
+    turn_max_tokens: int = CONTEXT_TURN_MAX_TOKENS,
+    model: str = MODEL,
+) -> List[Dict]:
+    """
+    As many of the newest pairs as fit in `budget` tokens, as chat messages oldest first.
+    Each turn is cut to turn_max_tokens so one long answer (a file read aloud) does not push out the rest.
+    """
+    packed: List[Tuple[str, str]] = []
+    used = 0
+    for pair in reversed(context or []):
+        user_msg = truncate_tokens(str(pair.get("user") or ""), turn_max_tokens, model)
+        bot_msg = truncate_tokens(str(pair.get("bot") or ""), turn_max_tokens, model)
+        cost = count_tokens(user_msg, model) + count_tokens(bot_msg, model)
+        if used + cost > budget:
+            break
+        used += cost
+        packed.append((user_msg, bot_msg))
+    messages: List[Dict] = []
+    for user_msg, bot_msg in reversed(packed):
+        if user_msg:
+            messages.append({"role": "user", "content": user_msg})
+        if bot_msg:
+            messages.append({"role": "assistant", "content": bot_msg})
+    return messages
+
+
+def build_messages(
+    system_prompt: str,
+    request: str,
+    context: Optional[List[Dict]] = None,
+    history_budget: int = CONTEXT_HISTORY_TOKENS,
+    model: str = MODEL,
+) -> List[Dict]:
+    """
+    Prompt laid out for provider prefix caching: the system prompt (instructions, schema) first and
+    byte-identical across calls, then the packed history as chat turns, then the new request last.
+    """
+    return [
+        {"role": "system", "content": system_prompt},
+        *pack_history(context, history_budget, model=model),
+        {"role": "user", "content": request},
+    ]
+
+
+def record_usage(completion, label: str):
+    """Track prompt size and the cached-prefix share reported in usage.prompt_tokens_details."""
+    usage = getattr(completion, "usage", None)
+    if usage is None or not usage.prompt_tokens:
+        return
+    if label not in prompt_tokens:
+        prompt_tokens[label] = ValueStat(f"prompt_tokens[{label}]")
+        cached_ratio[label] = ValueStat(f"cached_ratio[{label}]")
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+    prompt_tokens[label].observe(usage.prompt_tokens)
+    cached_ratio[label].observe(cached / usage.prompt_tokens)
+    logger.info(f"[Prompt] {label}: {usage.prompt_tokens} tokens, {cached} cached")
+
+
+def stats() -> Dict:
+    return {
+        label: {"prompt_tokens": prompt_tokens[label].snapshot(), "cached_ratio": cached_ratio[label].snapshot()}
+        for label in prompt_tokens
+    }
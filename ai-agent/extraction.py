@@ -0,0 +1,135 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterator, List, Optional, Tuple
+from PyPDF2 import PdfReader
+from docx import Document
+from logger import logger
+from const import EXTRACT_PARALLEL_MIN_PAGES, EXTRACT_PAGES_PER_TASK, EXTRACT_MAX_WORKERS
+
+PLAIN_TEXT_BLOCK = 64 * 1024
+
+
+class ExtractionCancelled(Exception):
+    """The caller set the cancel event while extract_text was reading."""
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Worker processes for page extraction, started on first large PDF."""
+    global _process_pool
+    if _process_pool is None:
+        workers = min(EXTRACT_MAX_WORKERS, os.cpu_count() or 1)
+        _process_pool = ProcessPoolExecutor(max_workers=workers)
+        logger.info(f"Started extraction pool with {workers} processes")
+    return _process_pool
+
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def _pdf_page_range(filepath: str, start: int, stop: int) -> List[str]:
+    """Runs in a pool process: text of pages [start, stop)."""
+    reader = PdfReader(filepath)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def iter_pdf_pages(filepath: str, parallel: bool = True) -> Iterator[str]:
+    """
+    Yield the text of each page in order.
+    PDFs with at least EXTRACT_PARALLEL_MIN_PAGES pages are extracted in the process pool, a bounded
+    number of page ranges ahead of the consumer; closing the generator cancels the ranges not started yet.
+    """
+    reader = PdfReader(filepath)
+    pages = len(reader.pages)
+    workers = min(EXTRACT_MAX_WORKERS, os.cpu_count() or 1)
+    if not parallel or pages < EXTRACT_PARALLEL_MIN_PAGES or workers < 2:
+        for page in reader.pages:
+            yield page.extract_text() or ""
+        return
+
+    pool = get_process_pool()
+    ranges = iter([(start, min(start + EXTRACT_PAGES_PER_TASK, pages)) for start in range(0, pages, EXTRACT_PAGES_PER_TASK)])
+    in_flight: Deque[Future] = deque()
+    try:
+        for _ in range(workers * 2):
+            page_range = next(ranges, None)
+            if page_range is None:
+                break
+            in_flight.append(pool.submit(_pdf_page_range, filepath, *page_range))
+        while in_flight:
+            texts = in_flight.popleft().result()
+            page_range = next(ranges, None)
+            if page_range is not None:
+                in_flight.append(pool.submit(_pdf_page_range, filepath, *page_range))
+            yield from texts
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+def iter_docx_paragraphs(filepath: str) -> Iterator[str]:
+    for para in Document(filepath).paragraphs:
+        yield para.text + "\n"
+
+
+def iter_plain_text(filepath: str) -> Iterator[str]:
+    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
+        while True:
+            block = f.read(PLAIN_TEXT_BLOCK)
+            if not block:
+                return
+            yield block
+
+
+def iter_chunks(filepath: str, parallel: bool = True) -> Iterator[str]:
+    """Stream a supported document as page (PDF), paragraph (DOCX) or block (plain text) chunks."""
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext == ".pdf":
+        return iter_pdf_pages(filepath, parallel=parallel)
+    if ext == ".docx":
+        return iter_docx_paragraphs(filepath)
+    return iter_plain_text(filepath)
+
+
+def extract_text(
+    filepath: str,
+    max_chars: Optional[int] = None,
+    parallel: bool = True,
+    cancel: Optional[threading.Event] = None,
+) -> Tuple[str, bool]:
+    """
+    Text of the document cut to `max_chars` (None: whole document), and whether it may have been cut.
+    Reading stops as soon as the budget is met; a text exactly max_chars long counts as cut, so the
+    text cache never keeps a possibly short text as the complete document.
+    `cancel` is checked between pages/paragraphs (a worker thread cannot be cancelled from the loop):
+    once set, pending page ranges are dropped and ExtractionCancelled is raised.
+    """
+    parts: List[str] = []
+    total = 0
+    chunks = iter_chunks(filepath, parallel=parallel)
+    try:
+        for chunk in chunks:
+            if cancel is not None and cancel.is_set():
+                raise ExtractionCancelled(filepath)
+            parts.append(chunk)
+            total += len(chunk)
+            if max_chars is not None and total >= max_chars:
+                return "".join(parts)[:max_chars], True
+    finally:
+        chunks.close()
+    return "".join(parts), False
+
+
+def extract_for_index(filepath: str, max_chars: int) -> str:
+    """Pool task for the content index: text of one document, '' if it cannot be read."""
+    try:
+        return extract_text(filepath, max_chars, parallel=False)[0]
+    except Exception:
+        return ""
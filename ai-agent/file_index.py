@@ -0,0 +1,508 @@
+import os
+import json
+import time
+import re
+import bisect
+import heapq
+import asyncio
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from logger import logger
+from const import (
+    DOWNLOADS_PATH,
+    FILE_INDEX_PATH,
+    FILE_INDEX_RESCAN_INTERVAL,
+    FILE_INDEX_SAVE_INTERVAL,
+    FUZZY_MIN_SCORE,
+    FUZZY_STOP_GRAM_MIN,
+    FUZZY_AUTO_SELECT_SCORE,
+    FUZZY_AUTO_SELECT_MARGIN,
+)
+
+try:
+    # inotify/FSEvents/ReadDirectoryChangesW watcher, installed with livekit-agents
+    from watchfiles import awatch
+except ImportError:
+    awatch = None
+
+
+_NON_ALNUM = re.compile(r"[\W_]+")
+_KNOWN_EXTS = (".pdf", ".docx", ".txt", ".md", ".csv", ".json")
+
+
+def normalize_name(name: str) -> str:
+    """'Quarterly_Report-FINAL(2).pdf' -> 'quarterly report final 2' (what STT would produce, give or take)."""
+    name = name.lower()
+    base, ext = os.path.splitext(name)
+    if ext in _KNOWN_EXTS:
+        name = base
+    return _NON_ALNUM.sub(" ", name).strip()
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FileEntry:
+    __slots__ = ("name", "path", "mtime", "size")
+
+    def __init__(self, name: str, path: str, mtime: float, size: int):
+        self.name = name
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+
+    def to_info(self) -> Dict:
+        """Same dict shape find_recent_pdfs_in_downloads always returned."""
+        return {
+            "file_name": self.name,
+            "full_path": self.path,
+            "modified_time": datetime.fromtimestamp(self.mtime),
+        }
+
+
+class DirState:
+    __slots__ = ("mtime_ns", "files", "subdirs")
+
+    def __init__(self, mtime_ns: int, files: Set[str], subdirs: Set[str]):
+        self.mtime_ns = mtime_ns
+        self.files = files
+        self.subdirs = subdirs
+
+
+class FileIndex:
+    """
+    Persistent index of every file under `root` (the Downloads folder).
+    - case-insensitive name -> paths dict for O(1) lookup
+    - list of (mtime, path) kept sorted for "nth most recent" queries
+    - per-directory mtime: a rescan only stats directories and lists the ones that changed
+    Kept current by a filesystem watcher when watchfiles is available, otherwise by a rescan
+    at most every FILE_INDEX_RESCAN_INTERVAL seconds on lookup.
+    """
+    def __init__(self, root: str = DOWNLOADS_PATH, path: Optional[str] = FILE_INDEX_PATH):
+        self.root = root
+        self.path = path
+        self._lock = threading.RLock()  # lookups also come from asyncio.to_thread workers
+        self._entries: Dict[str, FileEntry] = {}
+        self._by_name: Dict[str, List[str]] = {}
+        # fuzzy lookup: trigram -> lowercase names containing it, and the trigram count of each name.
+        # Built on first use (or by warm()), then maintained incrementally.
+        self._trigram_postings: Dict[str, Set[str]] = {}
+        self._name_grams: Dict[str, int] = {}
+        self._grams_built = False
+        self._by_mtime: List[Tuple[float, str]] = []
+        self._dirs: Dict[str, DirState] = {}
+        self._mtime_sorted = True  # bulk scans append and sort once at the end
+        self._last_refresh = 0.0
+        self._last_save = 0.0
+        self._dirty = False
+        self._watching = False
+        self._watch_task: Optional[asyncio.Task] = None
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ---------- mutations ----------
+    def _upsert(self, name: str, path: str, mtime: float, size: int):
+        entry = self._entries.get(path)
+        if entry is not None:
+            if entry.mtime == mtime and entry.size == size:
+                return
+            self._remove(path)
+        self._entries[path] = FileEntry(name, path, mtime, size)
+        key = name.lower()
+        paths = self._by_name.get(key)
+        if paths is None:
+            self._by_name[key] = [path]
+            self._add_grams(key)
+        else:
+            paths.append(path)
+        if self._mtime_sorted:
+            bisect.insort(self._by_mtime, (mtime, path))
+        else:
+            self._by_mtime.append((mtime, path))
+        self._dirty = True
+
+    def _remove(self, path: str):
+        entry = self._entries.pop(path, None)
+        if entry is None:
+            return
+        key = entry.name.lower()
+        paths = self._by_name.get(key)
+        if paths:
+            paths.remove(path)
+            if not paths:
+                del self._by_name[key]
+                self._remove_grams(key)
+        self._sort_by_mtime()
+        i = bisect.bisect_left(self._by_mtime, (entry.mtime, path))
+        if i < len(self._by_mtime) and self._by_mtime[i] == (entry.mtime, path):
+            del self._by_mtime[i]
+        self._dirty = True
+
+    def _add_grams(self, key: str):
+        if not self._grams_built:
+            return
+        grams = trigrams(normalize_name(key))
+        self._name_grams[key] = len(grams)
+        for gram in grams:
+            postings = self._trigram_postings.get(gram)
+            if postings is None:
+                self._trigram_postings[gram] = {key}
+            else:
+                postings.add(key)
+
+    def _remove_grams(self, key: str):
+        if not self._grams_built:
+            return
+        self._name_grams.pop(key, None)
+        for gram in trigrams(normalize_name(key)):
+            postings = self._trigram_postings.get(gram)
+            if postings is not None:
+                postings.discard(key)
+                if not postings:
+                    del self._trigram_postings[gram]
+
+    def _build_grams(self):
+        if self._grams_built:
+            return
+        started = time.perf_counter()
+        self._grams_built = True
+        for key in self._by_name:
+            self._add_grams(key)
+        logger.info(f"File name trigram index built in {time.perf_counter() - started:.3f}s")
+
+    def _sort_by_mtime(self):
+        if not self._mtime_sorted:
+            self._by_mtime.sort()
+            self._mtime_sorted = True
+
+    def _drop_tree(self, dirpath: str):
+        state = self._dirs.pop(dirpath, None)
+        if state is None:
+            return
+        for name in state.files:
+            self._remove(os.path.join(dirpath, name))
+        for sub in state.subdirs:
+            self._drop_tree(sub)
+        self._dirty = True
+
+    def _list_dir(self, dirpath: str, mtime_ns: int):
+        """Re-list one directory and apply the difference to the index."""
+        files: Dict[str, Tuple[float, int]] = {}
+        subdirs: Set[str] = set()
+        try:
+            with os.scandir(dirpath) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.add(entry.path)
+                        elif entry.is_file():
+                            st = entry.stat()
+                            files[entry.name] = (st.st_mtime, st.st_size)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning(f"Cannot list {dirpath}: {e}")
+            self._drop_tree(dirpath)
+            return
+        old = self._dirs.get(dirpath)
+        if old is not None:
+            for name in old.files - files.keys():
+                self._remove(os.path.join(dirpath, name))
+            for sub in old.subdirs - subdirs:
+                self._drop_tree(sub)
+        for name, (mtime, size) in files.items():
+            self._upsert(name, os.path.join(dirpath, name), mtime, size)
+        self._dirs[dirpath] = DirState(mtime_ns, set(files), subdirs)
+        self._dirty = True
+
+    def _scan(self, start: str, force: bool = False):
+        """Walk from `start`; only directories whose mtime changed (or `start` when forced) are listed."""
+        stack = [start]
+        while stack:
+            dirpath = stack.pop()
+            try:
+                mtime_ns = os.stat(dirpath).st_mtime_ns
+            except OSError:
+                self._drop_tree(dirpath)
+                continue
+            state = self._dirs.get(dirpath)
+            if state is None or state.mtime_ns != mtime_ns or (force and dirpath == start):
+                self._list_dir(dirpath, mtime_ns)
+                state = self._dirs.get(dirpath)
+            if state is not None:
+                stack.extend(state.subdirs)
+
+    def refresh(self, force: bool = False):
+        """Bring the index up to date. Cheap when nothing changed: one stat per directory."""
+        with self._lock:
+            started = time.perf_counter()
+            if force:
+                self._dirs.clear()
+                self._entries.clear()
+                self._by_name.clear()
+                self._trigram_postings.clear()
+                self._name_grams.clear()
+                self._grams_built = False
+                self._by_mtime.clear()
+            if not self._entries:
+                self._mtime_sorted = False
+            self._scan(self.root)
+            self._sort_by_mtime()
+            self._last_refresh = time.monotonic()
+            if self._dirty:
+                logger.info(
+                    f"File index refreshed: {len(self._entries)} files in {time.perf_counter() - started:.3f}s"
+                )
+        self._maybe_save()
+
+    def _ensure_fresh(self):
+        if self._watching and self._last_refresh:
+            return
+        if time.monotonic() - self._last_refresh >= FILE_INDEX_RESCAN_INTERVAL:
+            self.refresh()
+
+    # ---------- queries ----------
+    def find(self, filename: str) -> Optional[str]:
+        """Full path of a file named `filename` (case-insensitive), None if not indexed."""
+        with self._lock:
+            self._ensure_fresh()
+            paths = self._by_name.get(filename.lower())
+            if not paths and not self._watching:
+                # created since the last rescan (e.g. just downloaded)
+                self.refresh()
+                paths = self._by_name.get(filename.lower())
+            return paths[0] if paths else None
+
+    def fuzzy_find(self, query: str, limit: int = 5) -> List[Tuple[float, str]]:
+        """
+        Best (score, path) matches for a spoken/approximate file name, highest first.
+        Score is the Dice coefficient of the normalized names' trigram sets (1.0 = same normalized name).
+        Candidates come from the query's rare trigrams; very common ones ("pdf", "ile") are only checked
+        for names that can still make the top `limit`.
+        """
+        grams = trigrams(normalize_name(query))
+        if not grams:
+            return []
+        with self._lock:
+            self._ensure_fresh()
+            self._build_grams()
+            stop_size = max(FUZZY_STOP_GRAM_MIN, len(self._name_grams) // 20)
+            rare, common = [], []
+            for gram in grams:
+                postings = self._trigram_postings.get(gram)
+                if postings:
+                    (rare if len(postings) <= stop_size else common).append(postings)
+            best = self._rank(len(grams), rare, common, limit)
+            # names sharing only common trigrams were not candidates; look at them if they could still rank
+            only_common_bound = 2 * len(common) / (len(grams) + len(common)) if common else 0.0
+            if only_common_bound >= FUZZY_MIN_SCORE and (len(best) < limit or best[0][0] < only_common_bound):
+                best = self._rank(len(grams), rare + common, [], limit)
+            best.sort(reverse=True)
+            return [(round(score, 3), self._by_name[key][0]) for score, key in best]
+
+    def _rank(self, query_grams: int, rare: List[Set[str]], common: List[Set[str]], limit: int) -> List[Tuple[float, str]]:
+        counts = Counter()
+        for postings in rare:
+            counts.update(postings)
+        buckets: Dict[int, List[str]] = {}
+        for key, shared in counts.items():
+            buckets.setdefault(shared, []).append(key)
+        best: List[Tuple[float, str]] = []  # min-heap of the top `limit`
+        for shared in sorted(buckets, reverse=True):
+            # Dice 2c / (q + n) with c <= shared + len(common) and n >= c
+            upper = shared + len(common)
+            bound = 2 * upper / (query_grams + upper)
+            if bound < FUZZY_MIN_SCORE or (len(best) >= limit and bound <= best[0][0]):
+                break
+            for key in buckets[shared]:
+                c = shared + sum(1 for postings in common if key in postings)
+                score = 2 * c / (query_grams + self._name_grams[key])
+                if score < FUZZY_MIN_SCORE:
+                    continue
+                if len(best) < limit:
+                    heapq.heappush(best, (score, key))
+                elif score > best[0][0]:
+                    heapq.heapreplace(best, (score, key))
+        return best
+
+    def resolve(self, filename: str) -> Tuple[Optional[str], List[Tuple[float, str]]]:
+        """
+        Exact name first, then the fuzzy index. Returns (path, candidates): path is set when the match is exact
+        or the best fuzzy candidate is confident enough and clearly ahead of the runner-up.
+        """
+        path = self.find(filename)
+        if path:
+            return path, [(1.0, path)]
+        candidates = self.fuzzy_find(filename)
+        if candidates:
+            best = candidates[0][0]
+            runner_up = candidates[1][0] if len(candidates) > 1 else 0.0
+            if best >= FUZZY_AUTO_SELECT_SCORE and best - runner_up >= FUZZY_AUTO_SELECT_MARGIN:
+                return candidates[0][1], candidates
+        return None, candidates
+
+    def files(self, exts: Iterable[str]) -> List[Tuple[str, float, int]]:
+        """(path, mtime, size) of every indexed file with one of `exts`."""
+        exts = tuple(e.lower() for e in exts)
+        with self._lock:
+            self._ensure_fresh()
+            return [
+                (entry.path, entry.mtime, entry.size)
+                for entry in self._entries.values()
+                if entry.name.lower().endswith(exts)
+            ]
+
+    def recent(
+        self,
+        exts: Iterable[str] = (".pdf",),
+        since: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict]:
+        """Files with one of `exts`, newest first, modified at or after `since` (epoch seconds)."""
+        exts = tuple(e.lower() for e in exts)
+        result = []
+        with self._lock:
+            self._ensure_fresh()
+            for mtime, path in reversed(self._by_mtime):
+                if since is not None and mtime < since:
+                    break
+                entry = self._entries[path]
+                if entry.name.lower().endswith(exts):
+                    result.append(entry.to_info())
+                    if limit is not None and len(result) >= limit:
+                        break
+        return result
+
+    # ---------- persistence ----------
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable file index {self.path}: {e}")
+            return
+        if data.get("root") != self.root:
+            return
+        with self._lock:
+            # bulk build straight into the in-memory layout; no per-file _upsert, trigrams come later
+            entries, by_name, by_mtime = self._entries, self._by_name, self._by_mtime
+            for dirpath, (mtime_ns, files, subdirs) in data.get("dirs", {}).items():
+                prefix = dirpath + os.sep
+                for name, (mtime, size) in files.items():
+                    path = prefix + name
+                    entries[path] = FileEntry(name, path, mtime, size)
+                    paths = by_name.get(name.lower())
+                    if paths is None:
+                        by_name[name.lower()] = [path]
+                    else:
+                        paths.append(path)
+                    by_mtime.append((mtime, path))
+                self._dirs[dirpath] = DirState(mtime_ns, set(files), set(subdirs))
+            by_mtime.sort()
+            self._mtime_sorted = True
+            self._dirty = False
+            self._last_save = time.monotonic()
+        logger.info(f"Loaded file index with {len(self._entries)} files from {self.path}")
+
+    def _maybe_save(self):
+        # the saved index only has to be close: directory mtimes are re-checked on the first rescan after load
+        if self._dirty and time.monotonic() - self._last_save >= FILE_INDEX_SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        """Write pending changes to disk. The snapshot is taken under the lock, the JSON is written outside it."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            self._last_save = time.monotonic()
+            if not self.path:
+                return
+            dirs = {}
+            for dirpath, state in self._dirs.items():
+                files = {}
+                for name in state.files:
+                    entry = self._entries.get(os.path.join(dirpath, name))
+                    if entry is not None:
+                        files[name] = [entry.mtime, entry.size]
+                dirs[dirpath] = [state.mtime_ns, files, sorted(state.subdirs)]
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"root": self.root, "dirs": dirs}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save file index: {e}")
+
+    def warm(self):
+        """Rescan and build the fuzzy index ahead of the first spoken file name. Blocking: run in a thread."""
+        self.refresh()
+        with self._lock:
+            self._build_grams()
+
+    # ---------- watcher ----------
+    def _apply_changes(self, dirs: Set[str]):
+        """Re-list the directories touched by filesystem events. Blocking: runs in a worker thread."""
+        with self._lock:
+            for dirpath in dirs:
+                if dirpath == self.root or dirpath.startswith(self.root + os.sep):
+                    self._scan(dirpath, force=True)
+        self._maybe_save()
+
+    async def _watch(self):
+        try:
+            await asyncio.to_thread(self.warm)
+            self._watching = True
+            async for changes in awatch(self.root, recursive=True):
+                dirs = set()
+                for _, changed in changes:
+                    # re-list the parent; a new/removed directory is picked up from there
+                    dirs.add(changed if os.path.isdir(changed) else os.path.dirname(changed))
+                # listing, stats and the JSON dump stay off the event loop (and so does the lock)
+                await asyncio.to_thread(self._apply_changes, dirs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"File watcher stopped, falling back to rescans: {e}")
+        finally:
+            self._watching = False
+
+    def start_watching(self):
+        """Keep the index current from filesystem events. No-op without watchfiles or a Downloads folder."""
+        if awatch is None or not os.path.isdir(self.root):
+            return
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+
+_file_index: Optional[FileIndex] = None
+_file_index_lock = threading.Lock()
+
+
+def get_file_index() -> FileIndex:
+    """Process-wide index of the Downloads folder, loaded from disk on first use (once, even from several threads)."""
+    global _file_index
+    if _file_index is None:
+        with _file_index_lock:
+            if _file_index is None:
+                _file_index = FileIndex()
+    return _file_index
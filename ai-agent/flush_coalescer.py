@@ -0,0 +1,193 @@
+import time
+import asyncio
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from logger import logger
+from metrics import LatencyStat, ValueStat
+from journal import MessageJournal, get_journal
+from backend_client import BACKEND_BASE, BACKEND_INGEST_KEY, get_http_client, request_as
+from const import BULK_BATCH_SIZE, BULK_MAX_DELAY
+
+
+class FlushCoalescer:
+    """
+    Worker-level batcher for conversation messages.
+    Sessions only request a flush; the coalescer waits until BULK_BATCH_SIZE messages are waiting
+    or the oldest request is BULK_MAX_DELAY old, then sends the journal of every session together
+    to backend's bulk endpoint (one request, one transaction per batch).
+    Without BACKEND_INGEST_KEY it falls back to one POST /api/messages per user.
+    """
+    def __init__(
+        self,
+        journal: Optional[MessageJournal] = None,
+        max_batch: int = BULK_BATCH_SIZE,
+        max_delay: float = BULK_MAX_DELAY,
+    ):
+        self.journal = journal or get_journal()
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._wakeup = asyncio.Event()
+        self._first_request_at: Optional[float] = None
+        self._requested_messages = 0
+        self._send_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._unknown_users: Set[str] = set()  # rejected by backend, kept in the journal
+        self.batch_size = ValueStat("bulk_batch_size")
+        self.batch_latency = LatencyStat("bulk_request_latency")
+        # time from the first flush request of a round until backend acknowledged it
+        self.flush_lag = LatencyStat("flush_lag")
+
+    def request_flush(self, messages: int = 0):
+        """Called by a session when it has messages worth sending. Never waits."""
+        if self._first_request_at is None:
+            self._first_request_at = time.monotonic()
+        self._requested_messages += messages
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    def user_registered(self, username: str):
+        """Backend knows `username` now (login / registration succeeded): send its journaled messages again."""
+        if username in self._unknown_users:
+            self._unknown_users.discard(username)
+            logger.info(f"User '{username}' registered, retrying its journaled messages.")
+            self.request_flush(self.journal.count(username))
+
+    async def flush(self) -> int:
+        """Send everything journaled right now and wait for backend. Returns sent messages."""
+        requested_at = self._first_request_at or time.monotonic()
+        self._first_request_at = None
+        self._requested_messages = 0
+        return await self._send_all(requested_at)
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self._first_request_at is None:
+                continue
+            remaining = self._first_request_at + self.max_delay - time.monotonic()
+            if self._requested_messages < self.max_batch and remaining > 0:
+                try:
+                    # more sessions may join this round until size or time is reached
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            requested_at = self._first_request_at
+            self._first_request_at = None
+            self._requested_messages = 0
+            try:
+                await self._send_all(requested_at)
+            except Exception as e:
+                # Giữ nguyên trong journal, thử lại sau max_delay
+                logger.error(f"Bulk flush failed: {e}")
+                self.request_flush()
+
+    async def _send_all(self, requested_at: float) -> int:
+        async with self._send_lock:
+            sent = 0
+            # a user whose batch failed is not sent again this round: ack() deletes every row up to an id,
+            # so acking a later batch would drop the failed rows (and send out of order)
+            failed_users: Set[str] = set()
+            up_to_id = self.journal.last_id()
+            after_id = 0
+            while True:
+                rows = self.journal.read_batch(after_id, up_to_id, self.max_batch)
+                if not rows:
+                    break
+                after_id = rows[-1][0]
+                by_user: Dict[str, List[Tuple[int, Dict]]] = defaultdict(list)
+                for row_id, username, dto in rows:
+                    if username not in self._unknown_users and username not in failed_users:
+                        by_user[username].append((row_id, dto))
+                if not by_user:
+                    continue
+                started = time.monotonic()
+                if BACKEND_INGEST_KEY:
+                    acked_users = await self._post_bulk(by_user)
+                else:
+                    acked_users = await self._post_per_user(by_user)
+                self.batch_latency.observe(time.monotonic() - started)
+                failed_users.update(username for username in by_user if username not in acked_users)
+                for username in acked_users:
+                    self.journal.ack(username, by_user[username][-1][0])
+                    sent += len(by_user[username])
+                self.batch_size.observe(sum(len(by_user[u]) for u in acked_users))
+            if sent:
+                self.flush_lag.observe(time.monotonic() - requested_at)
+                logger.info(f"Flushed {sent} messages (lag {self.flush_lag.last:.2f}s)")
+            if failed_users:
+                # same backoff as a failed bulk request: kept in the journal, retried after max_delay
+                self.request_flush()
+            return sent
+
+    async def _post_bulk(self, by_user: Dict[str, List[Tuple[int, Dict]]]) -> List[str]:
+        payload = [
+            {"username": username, "messages": [dto for _, dto in rows]}
+            for username, rows in by_user.items()
+        ]
+        resp = await get_http_client().post(
+            f"{BACKEND_BASE}/api/messages/bulk",
+            json=payload,
+            headers={"X-Ingest-Key": BACKEND_INGEST_KEY},
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        unknown = set(data.get("unknownUsers") or data.get("UnknownUsers") or [])
+        if unknown:
+            logger.error(f"Backend does not know users {sorted(unknown)}, keeping their messages in the journal.")
+            self._unknown_users |= unknown
+        return [username for username in by_user if username not in unknown]
+
+    async def _post_per_user(self, by_user: Dict[str, List[Tuple[int, Dict]]]) -> List[str]:
+        async def post(username: str, rows: List[Tuple[int, Dict]]):
+            resp = await request_as(
+                username, "POST", f"{BACKEND_BASE}/api/messages", json=[dto for _, dto in rows]
+            )
+            resp.raise_for_status()
+
+        results = await asyncio.gather(
+            *(post(username, rows) for username, rows in by_user.items()), return_exceptions=True
+        )
+        acked = []
+        for username, result in zip(by_user, results):
+            if isinstance(result, Exception):
+                logger.error(f"Flush failed for '{username}': {result}")
+            else:
+                acked.append(username)
+        return acked
+
+    def stats(self) -> Dict:
+        return {
+            "batch_size": self.batch_size.snapshot(),
+            "batch_latency": self.batch_latency.snapshot(),
+            "flush_lag": self.flush_lag.snapshot(),
+        }
+
+    async def aclose(self, timeout: float):
+        """Drain the journal (worker shutdown) and stop the background task."""
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except Exception as e:
+            logger.warning(f"Could not drain message journal on shutdown: {e}")
+        finally:
+            if self._task is not None:
+                self._task.cancel()
+                try:
+                    await self._task
+                except asyncio.CancelledError:
+                    pass
+                self._task = None
+            logger.info(f"Flush coalescer stats: {self.stats()}")
+
+
+_coalescer: Optional[FlushCoalescer] = None
+
+
+def get_coalescer() -> FlushCoalescer:
+    """Process-wide coalescer shared by every ConversationCache."""
+    global _coalescer
+    if _coalescer is None:
+        _coalescer = FlushCoalescer()
+    return _coalescer
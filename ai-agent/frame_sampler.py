@@ -0,0 +1,130 @@
+import time
+import asyncio
+from collections import deque
+from typing import Callable, Coroutine, Deque, Dict, List, Optional, Tuple
+from livekit import rtc
+from logger import logger
+from metrics import LatencyStat
+from const import (
+    FRAME_SAMPLE_FPS,
+    FRAME_BUFFER_SIZE,
+    FRAME_IDLE_TIMEOUT,
+    FRAME_MAX_AGE,
+    FRAME_WAIT_TIMEOUT,
+)
+
+
+class FrameSampler:
+    """
+    Per-room camera sampler. Subscribes once to each published video track and keeps the most recent
+    frames, sampled at `fps`, in a small ring buffer so a camera question reads a frame instantly.
+    Frames stay in their native buffer type: nothing is decoded on the event loop, the vision pool converts
+    the one frame a question uses (vision.prepare_frame_async).
+    When no frame was requested for `idle_timeout` seconds only the newest frame is kept.
+    """
+    def __init__(
+        self,
+        fps: float = FRAME_SAMPLE_FPS,
+        buffer_size: int = FRAME_BUFFER_SIZE,
+        idle_timeout: float = FRAME_IDLE_TIMEOUT,
+        max_age: float = FRAME_MAX_AGE,
+    ):
+        self.interval = 1.0 / fps
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self._frames: Deque[Tuple[float, rtc.VideoFrame]] = deque(maxlen=buffer_size)  # (monotonic, raw frame)
+        self._tasks: Dict[str, asyncio.Task] = {}  # track sid -> reader task
+        self._new_frame = asyncio.Event()
+        self._last_request = 0.0
+        self.received = 0
+        self.sampled = 0
+        self.frame_age = LatencyStat("camera_frame_age")
+        self.wait = LatencyStat("camera_frame_wait")
+
+    def attach(self, track: rtc.Track, spawn: Callable[[Coroutine], asyncio.Task] = asyncio.create_task):
+        """Start sampling `track` (no-op if it is already sampled)."""
+        if track.kind != rtc.TrackKind.KIND_VIDEO or track.sid in self._tasks:
+            return
+        logger.info(f"Sampling video track {track.sid} at {1 / self.interval:g} fps")
+        sid = track.sid
+        task = spawn(self._run(track))
+        self._tasks[sid] = task
+        # after a detach + re-attach the sid belongs to a newer task: leave that one registered
+        task.add_done_callback(lambda t: self._tasks.get(sid) is t and self._tasks.pop(sid))
+
+    def detach(self, track_sid: Optional[str] = None):
+        """Stop sampling one track (every track if None)."""
+        sids = [track_sid] if track_sid is not None else list(self._tasks)
+        for sid in sids:
+            task = self._tasks.pop(sid, None)
+            if task is not None:
+                task.cancel()
+        if not self._tasks:
+            self._frames.clear()
+
+    @property
+    def active(self) -> bool:
+        return time.monotonic() - self._last_request < self.idle_timeout
+
+    async def _run(self, track: rtc.Track):
+        # capacity=1: a slow consumer gets the newest frame instead of a growing queue
+        stream = rtc.VideoStream(track, capacity=1)
+        next_sample = 0.0
+        try:
+            async for event in stream:
+                self.received += 1
+                now = time.monotonic()
+                if now < next_sample:
+                    continue
+                next_sample = now + self.interval
+                if not self.active:
+                    # nobody asked for a while: don't hold a buffer of full-size frames
+                    self._frames.clear()
+                self._frames.append((now, event.frame))
+                self.sampled += 1
+                self._new_frame.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Video sampling stopped for track {track.sid}: {e}")
+        finally:
+            await stream.aclose()
+
+    def _newest(self) -> Optional[Tuple[float, rtc.VideoFrame]]:
+        return self._frames[-1] if self._frames else None
+
+    async def latest(self, timeout: float = FRAME_WAIT_TIMEOUT) -> Optional[rtc.VideoFrame]:
+        """
+        Newest frame (native buffer type), immediately when one younger than max_age is buffered.
+        Otherwise waits up to `timeout` for the next frame; None when the camera sends nothing.
+        """
+        started = time.monotonic()
+        self._last_request = started
+        newest = self._newest()
+        while newest is None or started - newest[0] > self.max_age:
+            remaining = started + timeout - time.monotonic()
+            if remaining <= 0 or not self._tasks:
+                return None
+            self._new_frame.clear()
+            try:
+                await asyncio.wait_for(self._new_frame.wait(), remaining)
+            except asyncio.TimeoutError:
+                return None
+            newest = self._newest()
+        now = time.monotonic()
+        self.wait.observe(now - started)
+        self.frame_age.observe(now - newest[0])
+        return newest[1]
+
+    def recent(self, n: int = FRAME_BUFFER_SIZE) -> List[rtc.VideoFrame]:
+        """Up to `n` buffered frames, oldest first."""
+        self._last_request = time.monotonic()
+        return [frame for _, frame in list(self._frames)[-n:]]
+
+    def stats(self) -> Dict:
+        return {
+            "received": self.received,
+            "sampled": self.sampled,
+            "wait": self.wait.snapshot(),
+            "frame_age": self.frame_age.snapshot(),
+        }
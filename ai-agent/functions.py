@@ -1,15 +1,41 @@
-from class_using import RequestType, Summarize, TTS, AgentResponse, FileContent
+from class_using import RequestType, RouteAndSummarize, Summarize, TTS, AgentResponse, FileContent
 from logger import logger
-from const import MODEL, MODEL_TTS, OUTPUT_DIR
-from client import client
+from const import (
+    MODEL,
+    MODEL_TTS,
+    OUTPUT_DIR,
+    TTS_VOICE,
+    TTS_CACHE_DIR,
+    TTS_CHUNK_SIZE,
+    CHARS_PER_TOKEN,
+    SUMMARY_CHUNK_TOKENS,
+    SUMMARY_CHUNK_WORDS,
+    SUMMARY_MAP_CONCURRENCY,
+    LONG_DOC_MAX_CHARS,
+    FUSED_PIPELINE,
+    CHAT_SUMMARY_WORDS,
+)
+from client import client, async_client, llm_slot, llm_call_counter
+from intent_router import intent_router, extract_target
+from metrics import LatencyStat, ValueStat
+from context_builder import build_messages, record_usage
+from summary_cache import get_summary_cache, content_hash
+from content_index import get_content_index
 from utils import (
     get_next_filename,
     return_text_to_speech,
     find_file_in_downloads,
     read_file_content,
+    read_file_prefix,
     get_nth_file_info,
 )
-from typing import List, Dict
+import os
+import shutil
+import asyncio
+import tempfile
+import hashlib
+import time
+from typing import List, Dict, Optional, Tuple
 
 model = MODEL
 model_tts = MODEL_TTS
@@ -52,31 +78,7 @@ def route_request_old(user_input: str) -> RequestType:
     return result
 
 
-def route_request(user_input: str, context: List[Dict]) -> RequestType:
-    """Router LLM call + context support to determine if user wants summary or raw read."""
-    logger.info("Routing request with context...")
-
-    # ---- Build contextual prompt ----
-    context_block = ""
-    if context:
-        for pair in context:
-            user_msg = pair.get("user", "")
-            bot_msg = pair.get("bot", "")
-            context_block += f"User: {user_msg}\nAssistant: {bot_msg}\n"
-
-    full_prompt = (
-        "Here is the conversation history:\n"
-        f"{context_block}\n"
-        f"Now classify this new user request: {user_input}"
-    )
-
-    # ---- LLM call ----
-    completion = client.beta.chat.completions.parse(
-        model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": """
+_ROUTER_SYSTEM_PROMPT = """
                     You are an expert at classifying user requests into two categories:
 
                     1. "read raw text" 
@@ -90,6 +92,8 @@ def route_request(user_input: str, context: List[Dict]) -> RequestType:
                     3. "unsupported"
                         - Use this for ANY request that is NOT "read raw text" or "read file and summary".
 
+                    Earlier messages are the conversation history; classify only the last user request.
+
                     Respond ONLY with a JSON object matching the schema:
                     {
                         "request_type": "...",
@@ -98,213 +102,488 @@ def route_request(user_input: str, context: List[Dict]) -> RequestType:
                         "file_name": "..." (if the user requests reading a specific file),
                         "nth_file": int (if the user requests reading the nth most recent file)
                     }
-                """,
-            },
-            {
-                "role": "user",
-                "content": full_prompt,
-            },
-        ],
-        response_format=RequestType,
-    )
+                """
 
-    # ---- Parse output ----
-    result = completion.choices[0].message.parsed
+
+def _router_messages(user_input: str, context: List[Dict]) -> List[Dict]:
+    # stable system prompt first (prefix cache), then token-budgeted history, then the request
+    return build_messages(_ROUTER_SYSTEM_PROMPT, f"Now classify this new user request: {user_input}", context)
+
+
+def _log_route(result: RequestType) -> RequestType:
     logger.info(
         f"[Router] Classified as: {result.request_type} | confidence: {result.confidence_score}"
     )
-
     return result
 
 
-def handle_summarization(text: str, max_words: int = 50) -> Summarize:
-    """Handle text summarization."""
-    logger.info("Handling summarization...")
+def route_request(user_input: str, context: List[Dict]) -> RequestType:
+    """Router LLM call + context support to determine if user wants summary or raw read."""
+    logger.info("Routing request with context...")
+
+    # ---- LLM call ----
+    completion = client.beta.chat.completions.parse(
+        model=model,
+        messages=_router_messages(user_input, context),
+        response_format=RequestType,
+    )
+    record_usage(completion, "router")
+
+    # ---- Parse output ----
+    return _log_route(completion.choices[0].message.parsed)
+
+
+async def route_request_async(user_input: str, context: List[Dict]) -> RequestType:
+    """Async version of route_request, runs on the shared AsyncOpenAI client."""
+    logger.info("Routing request with context...")
+    async with llm_slot():
+        completion = await async_client.chat.completions.parse(
+            model=model,
+            messages=_router_messages(user_input, context),
+            response_format=RequestType,
+        )
+    record_usage(completion, "router")
+    return _log_route(completion.choices[0].message.parsed)
+
 
+def _summarization_messages(text: str, max_words: int) -> List[Dict]:
     prompt = f"""Summarize the following text in about {max_words} words:\n\n{text}
         User input might be had this format:
         - Requested for summarizing text
         - Text to be summarized under the request
         So please summarize the text only, without including the request part.
         """
+    return [
+        {
+            "role": "system",
+            "content": "You are a helpful assistant that summarizes text.",
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def handle_summarization(text: str, max_words: int = 50) -> Summarize:
+    """Handle text summarization."""
+    logger.info("Handling summarization...")
+
+    # Same document (same extracted text) summarized before -> no LLM call
+    summary_cache = get_summary_cache()
+    text_hash = content_hash(text)
+    cached = summary_cache.get(text_hash, max_words, model)
+    if cached is not None:
+        logger.info("Summary cache hit.")
+        return Summarize(summary=cached, raw_text=text)
 
     completion = client.beta.chat.completions.parse(
         model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": "You are a helpful assistant that summarizes text.",
-            },
-            {"role": "user", "content": prompt},
-        ],
+        messages=_summarization_messages(text, max_words),
         response_format=Summarize,
     )
 
     summary = completion.choices[0].message.parsed
     summary.raw_text = text
+    summary_cache.put(text_hash, max_words, model, summary.summary)
     logger.info("Summarization completed.")
 
     return summary
 
 
-def handle_tts(text: str) -> TTS:
+async def handle_summarization_async(text: str, max_words: int = 50) -> Summarize:
+    """Async version of handle_summarization."""
+    logger.info("Handling summarization...")
+    summary_cache = get_summary_cache()
+    text_hash = content_hash(text)
+    cached = summary_cache.get(text_hash, max_words, model)
+    if cached is not None:
+        logger.info("Summary cache hit.")
+        return Summarize(summary=cached, raw_text=text)
+
+    async with llm_slot():
+        completion = await async_client.chat.completions.parse(
+            model=model,
+            messages=_summarization_messages(text, max_words),
+            response_format=Summarize,
+        )
+    summary = completion.choices[0].message.parsed
+    summary.raw_text = text
+    summary_cache.put(text_hash, max_words, model, summary.summary)
+    logger.info("Summarization completed.")
+    return summary
+
+
+def _split_chunks(text: str, chunk_chars: int) -> List[str]:
+    """Split on line boundaries into chunks of at most chunk_chars; longer lines are cut."""
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in text.splitlines(keepends=True):
+        while len(line) > chunk_chars:
+            head, line = line[:chunk_chars], line[chunk_chars:]
+            if current:
+                chunks.append("".join(current))
+                current, size = [], 0
+            chunks.append(head)
+        if size + len(line) > chunk_chars and current:
+            chunks.append("".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line)
+    if current:
+        chunks.append("".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+async def handle_long_summarization_async(text: str, max_words: int = 50) -> Summarize:
+    """
+    Map-reduce summarization for documents longer than one LLM call's input.
+    Chunks are summarized concurrently (SUMMARY_MAP_CONCURRENCY per document), then the partial summaries
+    are grouped and summarized again level by level until one text is left for the final summary.
+    Every call goes through handle_summarization_async, so chunk and intermediate summaries are cached
+    and a second question about the same file is answered from the summary cache.
+    """
+    chunk_chars = SUMMARY_CHUNK_TOKENS * CHARS_PER_TOKEN
+    if len(text) <= chunk_chars:
+        return await handle_summarization_async(text, max_words=max_words)
+
+    semaphore = asyncio.Semaphore(SUMMARY_MAP_CONCURRENCY)
+
+    async def summarize_part(part: str) -> str:
+        async with semaphore:
+            return (await handle_summarization_async(part, max_words=SUMMARY_CHUNK_WORDS)).summary
+
+    parts = _split_chunks(text, chunk_chars)
+    level = 0
+    while len(parts) > 1:
+        level += 1
+        logger.info(f"Map-reduce level {level}: summarizing {len(parts)} chunks...")
+        # TaskGroup: one failed chunk cancels the others instead of leaving them running
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(summarize_part(part)) for part in parts]
+        summaries = [task.result() for task in tasks]
+        grouped = _split_chunks("\n\n".join(summaries), chunk_chars)
+        if len(grouped) >= len(parts):
+            # partial summaries did not shrink the text, summarize them pairwise
+            grouped = ["\n\n".join(summaries[i:i + 2]) for i in range(0, len(summaries), 2)]
+        parts = grouped
+
+    summary = await handle_summarization_async(parts[0], max_words=max_words)
+    summary.raw_text = text
+    return summary
+
+
+def _conversation_summary_messages(previous_summary: str, transcript: str, max_words: int) -> List[Dict]:
+    prompt = f"""Update the running summary of a voice conversation between a user and an assistant.
+        Keep names, files, decisions and open questions; drop greetings and small talk.
+        Answer with the new summary only, in about {max_words} words.
+
+        Current summary:
+        {previous_summary or "(none)"}
+
+        Earlier turns to add:
+        {transcript}
+        """
+    return [
+        {
+            "role": "system",
+            "content": "You are a helpful assistant that summarizes conversations.",
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+async def summarize_conversation_async(
+    previous_summary: str, transcript: str, max_words: int = CHAT_SUMMARY_WORDS
+) -> str:
+    """Fold older conversation turns into the rolling summary kept at the top of the agent's ChatContext."""
+    logger.info("Summarizing older conversation turns...")
+    async with llm_slot():
+        result = await async_client.chat.completions.create(
+            model=MODEL,
+            messages=_conversation_summary_messages(previous_summary, transcript, max_words),
+        )
+    return result.choices[0].message.content.strip()
+
+
+def _tts_cache_path(text: str, voice: str, model_name: str) -> str:
+    key = hashlib.sha256(f"{model_name}\x1f{voice}\x1f{text}".encode("utf-8")).hexdigest()
+    return os.path.join(TTS_CACHE_DIR, f"{key}.mp3")
+
+
+def _publish_to_cache(output_path: str, cache_path: str):
+    """Make a finished output file available under its content address (hard link, copy as fallback)."""
+    os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+    try:
+        os.link(output_path, cache_path)  # atomic; fails if another call already published it
+        return
+    except FileExistsError:
+        return  # same content address -> same audio
+    except OSError:
+        pass
+    fd, tmp_path = tempfile.mkstemp(dir=TTS_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as dst, open(output_path, "rb") as src:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def handle_tts(text: str, voice: str = TTS_VOICE) -> TTS:
     """Handle text-to-speech conversion."""
     logger.info("Starting text-to-speech conversion...")
 
     # Clean the text to be read
     cleaned_text = return_text_to_speech(text)
-    # Call the OpenAI Audio API for TTS
-    with client.audio.speech.with_streaming_response.create(
-        model=model_tts, voice="alloy", input=cleaned_text
-    ) as response:
-        audio_bytes = response.read()
-    # Find next available filename
+
+    # Same text, voice and model synthesized before -> serve it from disk
+    cache_path = _tts_cache_path(cleaned_text, voice, model_tts)
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            audio_bytes = f.read()
+        logger.info(f"TTS cache hit: {cache_path}")
+        return TTS(raw_text=cleaned_text, audio_content=audio_bytes, audio_direction=cache_path)
+
+    # Reserve the next output file, then write audio chunks as they arrive
     output_path = get_next_filename(OUTPUT_DIR)
-    # Save audio bytes to file
-    with open(output_path, "wb") as f:
-        f.write(audio_bytes)
+    chunks = []
+    try:
+        with client.audio.speech.with_streaming_response.create(
+            model=model_tts, voice=voice, input=cleaned_text
+        ) as response, open(output_path, "wb") as f:
+            for chunk in response.iter_bytes(TTS_CHUNK_SIZE):
+                f.write(chunk)
+                chunks.append(chunk)
+    except Exception:
+        os.remove(output_path)
+        raise
+    _publish_to_cache(output_path, cache_path)
     logger.info(f"Saved file in: {output_path}")
     return TTS(
-        raw_text=cleaned_text, audio_content=audio_bytes, audio_direction=output_path
+        raw_text=cleaned_text, audio_content=b"".join(chunks), audio_direction=output_path
     )
 
 
-def handle_read_file_or_summary(
-    route_result: RequestType, max_words: int = 50, intent_summary: bool = False
-) -> FileContent:
-    """Handle reading a file or summarizing its content."""
-    logger.info("Handling read file or summary...")
+def _resolve_file(route_result: RequestType) -> Tuple[Optional[str], Optional[str]]:
+    """(file_name, full path) of the file the router picked; FileNotFoundError if nothing matches."""
     if route_result.file_name:
         try:
             filepath = find_file_in_downloads(route_result.file_name)
             print(f"Found file at: {filepath}")
-            file_content = read_file_content(filepath)
         except Exception as e:
+            # a named file that is not there is reported with its "Did you mean" candidates,
+            # never swapped for a document that merely shares a word with the name
             logger.error(f"Error reading file: {e}")
             raise
-
-        if intent_summary:
-            summary = handle_summarization(file_content, max_words=max_words)
-            return FileContent(
-                file_name=route_result.file_name, content=file_content, summary=summary
-            )
-        else:
-            return FileContent(
-                file_name=route_result.file_name,
-                content=file_content,
-                summary=Summarize(
-                    summary="Summary not requested.", raw_text=file_content
-                ),
-            )
+        return route_result.file_name, filepath
     elif route_result.nth_file:
         try:
             nth_file_info = get_nth_file_info(route_result.nth_file)
-            filepath = nth_file_info["full_path"]
-            file_name = nth_file_info["file_name"]
-            print(f"Found nth file at: {filepath}")
-            file_content = read_file_content(filepath)
+            print(f"Found nth file at: {nth_file_info['full_path']}")
         except Exception as e:
             logger.error(f"Error reading nth file: {e}")
             raise
+        return nth_file_info["file_name"], nth_file_info["full_path"]
+    # neither a name nor a position: "the PDF about the budget"
+    filepath = _search_by_content(route_result.description)
+    if filepath is not None:
+        return os.path.basename(filepath), filepath
+    raise FileNotFoundError(f"No file in the Downloads folder matches '{route_result.description}'.")
+
+
+def _search_by_content(description: str) -> Optional[str]:
+    """
+    Best match of the full-text index of Downloads for a content description, None if nothing matches.
+    Only used when the request names no file; every term of the description must match.
+    """
+    if not description:
+        return None
+    matches = get_content_index().search(description, limit=1, match_all=True)
+    if not matches:
+        return None
+    score, filepath = matches[0]
+    logger.info(f"Content search '{description}' -> {os.path.basename(filepath)} (score {score})")
+    return filepath
+
+
+def _read_file(filepath: str, max_chars: int = 8000) -> str:
+    try:
+        return read_file_content(filepath, max_chars=max_chars)
+    except Exception as e:
+        logger.error(f"Error reading file: {e}")
+        raise
+
+
+def _not_summarized(file_name: str, file_content: str) -> FileContent:
+    return FileContent(
+        file_name=file_name,
+        content=file_content,
+        summary=Summarize(summary="Summary not requested.", raw_text=file_content),
+    )
 
-        if intent_summary:
-            summary = handle_summarization(file_content, max_words=max_words)
-            return FileContent(
-                file_name=file_name, content=file_content, summary=summary
-            )
-        else:
-            return FileContent(
-                file_name=file_name,
-                content=file_content,
-                summary=Summarize(
-                    summary="Summary not requested.", raw_text=file_content
-                ),
-            )
+
+def handle_read_file_or_summary(
+    route_result: RequestType, max_words: int = 50, intent_summary: bool = False
+) -> FileContent:
+    """Handle reading a file or summarizing its content."""
+    logger.info("Handling read file or summary...")
+    file_name, filepath = _resolve_file(route_result)
+    file_content = _read_file(filepath)
+
+    if intent_summary:
+        summary = handle_summarization(file_content, max_words=max_words)
+        return FileContent(file_name=file_name, content=file_content, summary=summary)
+    return _not_summarized(file_name, file_content)
+
+
+async def handle_read_file_or_summary_async(
+    route_result: RequestType, max_words: int = 50, intent_summary: bool = False
+) -> FileContent:
+    """
+    Async version of handle_read_file_or_summary.
+    File lookup and extraction (PDF/DOCX parsing) run in a worker thread so the event loop keeps serving audio.
+    """
+    logger.info("Handling read file or summary...")
+    file_name, filepath = await asyncio.to_thread(_resolve_file, route_result)
+    if intent_summary:
+        # whole document (up to LONG_DOC_MAX_CHARS), summarized chunk by chunk when it is long
+        file_content = await asyncio.to_thread(_read_file, filepath, LONG_DOC_MAX_CHARS)
+        summary = await handle_long_summarization_async(file_content, max_words=max_words)
+        return FileContent(file_name=file_name, content=file_content, summary=summary)
+    file_content = await asyncio.to_thread(_read_file, filepath)
+    return _not_summarized(file_name, file_content)
 
 def handle_normal_chat(user_input: str, context: List[Dict]) -> str:
     """Handle normal chat requests."""
     logger.info("Handling normal chat...")
 
-    # ---- Build contextual prompt ----
-    context_block = ""
-    if context:
-        for pair in context:
-            user_msg = pair.get("user", "")
-            bot_msg = pair.get("bot", "")
-            context_block += f"User: {user_msg}\nAssistant: {bot_msg}\n"
-
-    full_prompt = (
-        "Here is the conversation history:\n"
-        f"{context_block}\n"
-        f"Now respond to this new user request: {user_input}"
-    )
-
-    completion = client.beta.chat.completions.create(
+    completion = client.chat.completions.create(
         model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": "You are a helpful and friendly assistant.",
-            },
-            {
-                "role": "user",
-                "content": full_prompt,
-            },
-        ],
+        messages=build_messages("You are a helpful and friendly assistant.", user_input, context),
     )
+    record_usage(completion, "chat")
 
     response_text = completion.choices[0].message.content.strip()
     logger.info("Normal chat response generated.")
     return response_text
 
+def _image_messages(user_input: str, base64_image: str) -> List[Dict]:
+    return [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": user_input},
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{base64_image}"
+                    }
+                }
+            ]
+        }
+    ]
+
 def handle_image_description(user_input: str, base64_image: str) -> str:
     """Handle image description requests."""
     logger.info("Handling image description...")
     result = client.chat.completions.create(
         model=MODEL,
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": user_input},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
-                        }
-                    }
-                ]
-            }
-        ],
+        messages=_image_messages(user_input, base64_image),
         max_tokens=100
     )
     return result.choices[0].message.content
 
 
+async def handle_image_description_async(user_input: str, base64_image: str) -> str:
+    """Async version of handle_image_description."""
+    logger.info("Handling image description...")
+    async with llm_slot():
+        result = await async_client.chat.completions.create(
+            model=MODEL,
+            messages=_image_messages(user_input, base64_image),
+            max_tokens=100
+        )
+    return result.choices[0].message.content
+
+
+def _is_confident(route_result: RequestType, request_type: str) -> bool:
+    return (
+        route_result.request_type == request_type
+        and route_result.confidence_score >= 0.7
+    )
+
+
+def _not_found_response(error: FileNotFoundError, intent: str) -> AgentResponse:
+    # spoken back as is, including the "Did you mean ..." candidates of the fuzzy index
+    return AgentResponse(status="need_input", message=str(error), intent=intent)
+
+
+def _unsupported_response() -> AgentResponse:
+    return AgentResponse(
+        status="unsupported",
+        message="Request type unsupported or confidence too low.",
+        intent="unsupported",
+    )
+
+
 def process_user_input(user_input: str, context: List[Dict]) -> AgentResponse:
     """Process user input and return an appropriate AgentResponse."""
-    route_result = route_request(user_input, context=context)
+    # rules / cache first, LLM router only when the local classifier is unsure
+    route_result = intent_router.route(user_input, context, route_request)
 
-    if (
-        route_result.request_type == "read raw text"
-        and route_result.confidence_score >= 0.7
-    ):
+    if _is_confident(route_result, "read raw text"):
         print("Processing read raw text request...")
-        read_file = handle_read_file_or_summary(route_result, intent_summary=False)
+        try:
+            read_file = handle_read_file_or_summary(route_result, intent_summary=False)
+        except FileNotFoundError as e:
+            return _not_found_response(e, "read raw text")
         return AgentResponse(
             status="done",
             message="Read file successfully.",
             raw_text=read_file.content,
             intent="read raw text",
         )
-    elif (
-        route_result.request_type == "read file and summary"
-        and route_result.confidence_score >= 0.7
-    ):
+    elif _is_confident(route_result, "read file and summary"):
         print("Processing read file and summary request...")
-        read_file_and_summary = handle_read_file_or_summary(
-            route_result, intent_summary=True
+        try:
+            read_file_and_summary = handle_read_file_or_summary(route_result, intent_summary=True)
+        except FileNotFoundError as e:
+            return _not_found_response(e, "read file and summary")
+        return AgentResponse(
+            status="done",
+            message="File read and summarized successfully.",
+            summary=read_file_and_summary.summary,
+            intent="read file and summary",
         )
+    else:
+        return _unsupported_response()
+
+
+async def _process_routed(
+    user_input: str, context: List[Dict], route_result: Optional[RequestType] = None
+) -> AgentResponse:
+    """Route (rules / cache / LLM router), then read or summarize."""
+    if route_result is None:
+        route_result = await intent_router.aroute(user_input, context, route_request_async)
+
+    if _is_confident(route_result, "read raw text"):
+        print("Processing read raw text request...")
+        try:
+            read_file = await handle_read_file_or_summary_async(route_result, intent_summary=False)
+        except FileNotFoundError as e:
+            return _not_found_response(e, "read raw text")
+        return AgentResponse(
+            status="done",
+            message="Read file successfully.",
+            raw_text=read_file.content,
+            intent="read raw text",
+        )
+    elif _is_confident(route_result, "read file and summary"):
+        print("Processing read file and summary request...")
+        try:
+            read_file_and_summary = await handle_read_file_or_summary_async(route_result, intent_summary=True)
+        except FileNotFoundError as e:
+            return _not_found_response(e, "read file and summary")
         return AgentResponse(
             status="done",
             message="File read and summarized successfully.",
@@ -312,8 +591,161 @@ def process_user_input(user_input: str, context: List[Dict]) -> AgentResponse:
             intent="read file and summary",
         )
     else:
+        return _unsupported_response()
+
+
+_FUSED_SYSTEM_PROMPT = """
+    You handle a user's spoken request about a file whose text is given to you.
+
+    1. Classify the request:
+        - "read raw text": the user wants to hear the file's content, no summary.
+        - "read file and summary": the user wants the content summarized, explained or its main points.
+        - "unsupported": anything else.
+    2. If and only if the request is "read file and summary" and a summary length is given, summarize the file text
+       (the text only, not the request) in about that number of words. Otherwise summary is null.
+
+    Earlier messages are the conversation history; handle only the last user request.
+
+    Respond ONLY with a JSON object matching the schema.
+"""
+
+
+def _fused_messages(user_input: str, context: List[Dict], text: str, max_words: int, summarize: bool) -> List[Dict]:
+    if summarize:
+        summary_line = f"Summary length: about {max_words} words"
+    else:
+        summary_line = "Summary: not needed (the file text is only the beginning of the file)"
+    return build_messages(
+        _FUSED_SYSTEM_PROMPT,
+        f"User request: {user_input}\n{summary_line}\n\nFile text:\n{text}",
+        context,
+    )
+
+
+async def route_and_summarize_async(
+    user_input: str, context: List[Dict], text: str, max_words: int = 50, summarize: bool = True
+) -> RouteAndSummarize:
+    """
+    One structured call that confirms the intent and, for summary requests, returns the summary.
+    With summarize=False (text is only a prefix of the file) it only classifies.
+    """
+    logger.info("Routing and summarizing in one call...")
+    async with llm_slot():
+        completion = await async_client.chat.completions.parse(
+            model=model,
+            messages=_fused_messages(user_input, context, text, max_words, summarize),
+            response_format=RouteAndSummarize,
+        )
+    record_usage(completion, "fused")
+    result = completion.choices[0].message.parsed
+    logger.info(f"[Fused] Classified as: {result.request_type} | confidence: {result.confidence_score}")
+    return result
+
+
+async def _process_fused(user_input: str, context: List[Dict], max_words: int = 50) -> AgentResponse:
+    """
+    Fused pipeline: confident local routing goes straight to reading/summarizing; otherwise, when the request
+    names a file, the file is resolved and read locally and a single structured call confirms the intent and
+    summarizes. Requests that name no file still go through the LLM router.
+    """
+    route_result = intent_router.lookup(user_input, context)
+    if route_result is not None:
+        return await _process_routed(user_input, context, route_result)
+
+    file_name, nth_file = extract_target(user_input)
+    if file_name is None and nth_file is None:
+        return await _process_routed(user_input, context)
+    target = RequestType(
+        request_type="unsupported",
+        confidence_score=0.0,
+        description=user_input.strip(),
+        file_name=file_name,
+        nth_file=nth_file,
+    )
+    try:
+        resolved_name, filepath = await asyncio.to_thread(_resolve_file, target)
+    except FileNotFoundError:
+        # the router may still make sense of a misheard name
+        return await _process_routed(user_input, context)
+
+    # the intent is not known yet: read what a raw read or a single summary call needs, not the whole document
+    file_content, truncated = await asyncio.to_thread(
+        read_file_prefix, filepath, SUMMARY_CHUNK_TOKENS * CHARS_PER_TOKEN
+    )
+    # a complete text summarized before: the call only has to classify
+    text_hash = None if truncated else content_hash(file_content)
+    cached = None if truncated else get_summary_cache().get(text_hash, max_words, model)
+    fused = await route_and_summarize_async(
+        user_input, context, file_content, max_words, summarize=not truncated and cached is None
+    )
+
+    if _is_confident(fused, "read raw text"):
+        print("Processing read raw text request...")
         return AgentResponse(
-            status="unsupported",
-            message="Request type unsupported or confidence too low.",
-            intent="unsupported",
+            status="done",
+            message="Read file successfully.",
+            raw_text=file_content[:8000],
+            intent="read raw text",
         )
+    elif _is_confident(fused, "read file and summary"):
+        print("Processing read file and summary request...")
+        if cached is not None:
+            logger.info("Summary cache hit.")
+            summary = Summarize(summary=cached, raw_text=file_content)
+        elif not truncated and fused.summary:
+            summary = Summarize(summary=fused.summary, raw_text=file_content)
+            get_summary_cache().put(text_hash, max_words, model, fused.summary)
+        else:
+            # longer than one call's input: read on to LONG_DOC_MAX_CHARS and map-reduce
+            file_content = await asyncio.to_thread(_read_file, filepath, LONG_DOC_MAX_CHARS)
+            summary = await handle_long_summarization_async(file_content, max_words=max_words)
+        return AgentResponse(
+            status="done",
+            message="File read and summarized successfully.",
+            summary=summary,
+            intent="read file and summary",
+        )
+    return _unsupported_response()
+
+
+# LLM calls and wall-clock latency per request, keyed "<pipeline>:<intent>" to compare fused and routed
+pipeline_llm_calls: Dict[str, ValueStat] = {}
+pipeline_latency: Dict[str, LatencyStat] = {}
+
+
+def _observe_pipeline(intent: str, llm_calls: int, seconds: float):
+    key = f"{'fused' if FUSED_PIPELINE else 'routed'}:{intent}"
+    if key not in pipeline_llm_calls:
+        pipeline_llm_calls[key] = ValueStat(f"llm_calls[{key}]")
+        pipeline_latency[key] = LatencyStat(f"latency[{key}]")
+    pipeline_llm_calls[key].observe(llm_calls)
+    pipeline_latency[key].observe(seconds)
+
+
+def pipeline_stats() -> Dict:
+    return {
+        key: {"llm_calls": pipeline_llm_calls[key].snapshot(), "latency": pipeline_latency[key].snapshot()}
+        for key in pipeline_llm_calls
+    }
+
+
+async def process_user_input_async(user_input: str, context: List[Dict]) -> AgentResponse:
+    """
+    Async version of process_user_input used by the agent's tools.
+    Every LLM call awaits the shared AsyncOpenAI client; cancelling the tool cancels the in-flight request.
+    """
+    counter = [0]
+    token = llm_call_counter.set(counter)
+    started = time.perf_counter()
+    intent = "error"
+    try:
+        if FUSED_PIPELINE:
+            result = await _process_fused(user_input, context)
+        else:
+            result = await _process_routed(user_input, context)
+        intent = result.intent
+        return result
+    finally:
+        llm_call_counter.reset(token)
+        _observe_pipeline(intent, counter[0], time.perf_counter() - started)
+        logger.info(f"[Pipeline] {intent}: {counter[0]} LLM calls in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,226 @@
+import re
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from class_using import RequestType
+from logger import logger
+from metrics import LatencyStat
+from const import INTENT_CACHE_SIZE, INTENT_LOCAL_CONFIDENCE
+
+SUPPORTED_EXTS = ("pdf", "docx", "txt", "md", "csv", "json")
+
+# STT often spells the extension out: "report dot pdf"
+_SPOKEN_DOT = re.compile(r"\s+dot\s+(" + "|".join(SUPPORTED_EXTS) + r")\b")
+_FILE_NAME = re.compile(r"([\w\-()\[\]]+(?:\.[\w\-()\[\]]+)*\.(?:" + "|".join(SUPPORTED_EXTS) + r"))\b")
+_NTH_NUMBER = re.compile(r"\b(?:file|pdf|document|number|thứ)\s*(?:number\s*)?#?(\d{1,2})\b|\b(\d{1,2})(?:st|nd|rd|th)\b")
+
+_ORDINALS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5,
+    "sixth": 6, "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10,
+    "nhất": 1, "hai": 2, "ba": 3, "tư": 4, "năm": 5,
+}
+_MOST_RECENT = ("latest", "most recent", "newest", "last file", "last pdf", "last document", "mới nhất", "gần nhất")
+_FILE_WORDS = ("file", "pdf", "document", "doc", "tài liệu", "tệp")
+
+# keyword -> weight for each intent
+_SUMMARY_CUES = {
+    "summarize": 2.0, "summarise": 2.0, "summary": 2.0, "tóm tắt": 2.0, "tldr": 2.0,
+    "main points": 1.5, "key points": 1.5, "gist": 1.5, "overview": 1.0,
+    "explain": 1.0, "what is it about": 1.0, "what's it about": 1.0, "brief": 1.0,
+}
+_READ_CUES = {
+    "read": 1.5, "đọc": 1.5, "read out": 2.0, "read aloud": 2.0, "raw": 1.5,
+    "full text": 2.0, "word for word": 2.0, "content of": 1.0, "contents of": 1.0,
+    "show me": 1.0, "open": 1.0,
+}
+# phrases that flip or qualify the intent; leave them to the LLM
+_AMBIGUOUS = ("don't", "do not", "not ", "without", "instead", "không")
+# references resolved from the conversation context
+_CONTEXT_REFS = re.compile(r"\b(it|that|this one|that one|same|again|previous|lại)\b")
+
+
+def normalize(text: str) -> str:
+    text = text.lower().strip()
+    text = _SPOKEN_DOT.sub(r".\1", text)
+    text = re.sub(r"[?!,;:\"“”]+", " ", text)
+    text = re.sub(r"\.(\s|$)", r"\1", text)  # sentence dots, not the ones inside file names
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def context_hash(context: List[Dict]) -> str:
+    h = hashlib.blake2b(digest_size=8)
+    for pair in context or []:
+        h.update(str(pair.get("user", "")).encode("utf-8"))
+        h.update(b"\x1f")
+        h.update(str(pair.get("bot", "")).encode("utf-8"))
+        h.update(b"\x1e")
+    return h.hexdigest()
+
+
+def _cue_patterns(cues: Dict[str, float]) -> List[Tuple[re.Pattern, float]]:
+    # whole words only: "read" must not match "already" or "spreadsheet"
+    return [(re.compile(r"(?<!\w)" + re.escape(cue) + r"(?!\w)"), weight) for cue, weight in cues.items()]
+
+
+_SUMMARY_PATTERNS = _cue_patterns(_SUMMARY_CUES)
+_READ_PATTERNS = _cue_patterns(_READ_CUES)
+
+
+def _score(text: str, patterns: List[Tuple[re.Pattern, float]]) -> float:
+    return sum(weight for pattern, weight in patterns if pattern.search(text))
+
+
+def _find_nth(text: str) -> Optional[int]:
+    if any(phrase in text for phrase in _MOST_RECENT):
+        return 1
+    if not any(word in text for word in _FILE_WORDS):
+        return None
+    match = _NTH_NUMBER.search(text)
+    if match:
+        return int(match.group(1) or match.group(2))
+    for word in text.split():
+        if word in _ORDINALS:
+            return _ORDINALS[word]
+    return None
+
+
+def extract_target(user_input: str) -> Tuple[Optional[str], Optional[int]]:
+    """(file_name, nth_file) named in the request, whatever the intent; (None, None) if it names no file."""
+    text = normalize(user_input)
+    match = _FILE_NAME.search(text)
+    if match:
+        file_name = match.group(1)
+        # keep the original casing of the file name, lookup is case-insensitive anyway
+        original = re.search(re.escape(file_name), _SPOKEN_DOT.sub(r".\1", user_input), re.IGNORECASE)
+        return (original.group(0) if original else file_name), None
+    return None, _find_nth(text)
+
+
+def classify_local(user_input: str) -> Optional[RequestType]:
+    """
+    Rule + keyword-score classifier for the common spoken patterns
+    ("read the first pdf", "summarize report.pdf").
+    Returns None when the request is not clear enough to skip the LLM router.
+    """
+    text = normalize(user_input)
+    if any(phrase in text for phrase in _AMBIGUOUS):
+        return None
+
+    file_name, nth_file = extract_target(user_input)
+    if file_name is None and nth_file is None:
+        # "summarize it again" etc. need the conversation context
+        return None
+
+    # cue words inside the file name ("summary_notes.pdf") say nothing about the intent
+    cue_text = _FILE_NAME.sub(" ", text)
+    summary_score = _score(cue_text, _SUMMARY_PATTERNS)
+    read_score = _score(cue_text, _READ_PATTERNS)
+    if summary_score == 0 and read_score == 0:
+        return None
+    if summary_score >= read_score:
+        request_type = "read file and summary"
+        # "read and summarize x.pdf" is still a summary request, only less certain
+        confidence = 0.95 if read_score == 0 else 0.9 if summary_score > read_score else 0.8
+    else:
+        request_type = "read raw text"
+        confidence = 0.95 if summary_score == 0 else 0.8
+    if file_name is None and _CONTEXT_REFS.search(text):
+        confidence -= 0.1
+
+    return RequestType(
+        request_type=request_type,
+        confidence_score=confidence,
+        description=user_input.strip(),
+        file_name=file_name,
+        nth_file=nth_file,
+    )
+
+
+class IntentRouter:
+    """
+    Fast path in front of the LLM router (functions.route_request).
+    1. local rules/keyword classifier, accepted when confidence >= min_confidence
+    2. LRU cache of previous LLM routings, keyed by normalized input + context hash
+    3. LLM fallback
+    """
+    def __init__(self, cache_size: int = INTENT_CACHE_SIZE, min_confidence: float = INTENT_LOCAL_CONFIDENCE):
+        self.cache_size = cache_size
+        self.min_confidence = min_confidence
+        self._cache: "OrderedDict[Tuple[str, str], RequestType]" = OrderedDict()
+        self.local_hits = 0
+        self.cache_hits = 0
+        self.llm_calls = 0
+        self.fast_path_latency = LatencyStat("route_fast_path")  # rules + cache lookup
+        self.llm_latency = LatencyStat("route_llm")
+
+    def _fast_path(self, user_input: str, context: List[Dict]) -> Tuple[Optional[RequestType], Tuple[str, str]]:
+        started = time.perf_counter()
+        result = classify_local(user_input)
+        key = (normalize(user_input), context_hash(context))
+        if result is not None and result.confidence_score >= self.min_confidence:
+            self.local_hits += 1
+            logger.info(f"[Router] Local: {result.request_type} | confidence: {result.confidence_score}")
+        else:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                logger.info(f"[Router] Cached: {result.request_type} | confidence: {result.confidence_score}")
+                result = result.model_copy()
+        self.fast_path_latency.observe(time.perf_counter() - started)
+        return result, key
+
+    def _remember(self, key: Tuple[str, str], result: RequestType):
+        self._cache[key] = result.model_copy()
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def lookup(self, user_input: str, context: List[Dict]) -> Optional[RequestType]:
+        """Local classifier or cached routing only; None means only the LLM router could decide."""
+        return self._fast_path(user_input, context)[0]
+
+    def route(
+        self, user_input: str, context: List[Dict], fallback: Callable[[str, List[Dict]], RequestType]
+    ) -> RequestType:
+        result, key = self._fast_path(user_input, context)
+        if result is not None:
+            return result
+        self.llm_calls += 1
+        started = time.perf_counter()
+        result = fallback(user_input, context)
+        self.llm_latency.observe(time.perf_counter() - started)
+        self._remember(key, result)
+        return result
+
+    async def aroute(
+        self, user_input: str, context: List[Dict], fallback: Callable[[str, List[Dict]], Awaitable[RequestType]]
+    ) -> RequestType:
+        result, key = self._fast_path(user_input, context)
+        if result is not None:
+            return result
+        self.llm_calls += 1
+        started = time.perf_counter()
+        result = await fallback(user_input, context)
+        self.llm_latency.observe(time.perf_counter() - started)
+        self._remember(key, result)
+        return result
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.local_hits + self.cache_hits + self.llm_calls
+        return (self.local_hits + self.cache_hits) / total if total else 0.0
+
+    def stats(self) -> Dict:
+        return {
+            "local_hits": self.local_hits,
+            "cache_hits": self.cache_hits,
+            "llm_calls": self.llm_calls,
+            "hit_rate": round(self.hit_rate, 3),
+            "fast_path_latency": self.fast_path_latency.snapshot(),
+            "llm_latency": self.llm_latency.snapshot(),
+        }
+
+
+intent_router = IntentRouter()
@@ -0,0 +1,115 @@
+import os
+import json
+import sqlite3
+from typing import List, Dict, Optional, Tuple
+from logger import logger
+from const import JOURNAL_PATH
+
+
+class MessageJournal:
+    """
+    Append-only local journal for conversation messages not yet acknowledged by backend.
+    Backed by SQLite in WAL mode; rows are tagged with the username so one file serves every session of the worker.
+    Delivery is at-least-once: rows are only deleted after backend acknowledged the batch containing them.
+    """
+    def __init__(self, path: str = JOURNAL_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # autocommit mode: every append is its own small transaction in the WAL
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pending_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                payload TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_pending_messages_username ON pending_messages (username, id)"
+        )
+
+    def append(self, username: str, message: Dict) -> int:
+        """Write one CreateMessageDto to the journal. Returns its journal id."""
+        cur = self._conn.execute(
+            "INSERT INTO pending_messages (username, payload) VALUES (?, ?)",
+            (username, json.dumps(message, ensure_ascii=False)),
+        )
+        return cur.lastrowid
+
+    def read(
+        self,
+        username: str,
+        after_id: int = 0,
+        limit: Optional[int] = None,
+        up_to_id: Optional[int] = None,
+    ) -> List[Tuple[int, Dict]]:
+        """Pending messages of `username` with after_id < id <= up_to_id, oldest first."""
+        query = "SELECT id, payload FROM pending_messages WHERE username = ? AND id > ?"
+        params: Tuple = (username, after_id)
+        if up_to_id is not None:
+            query += " AND id <= ?"
+            params += (up_to_id,)
+        query += " ORDER BY id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        return [(row_id, json.loads(payload)) for row_id, payload in self._conn.execute(query, params)]
+
+    def read_tail(self, username: str, limit: int) -> List[Tuple[int, Dict]]:
+        """Newest `limit` pending messages of `username`, oldest first."""
+        rows = self._conn.execute(
+            "SELECT id, payload FROM pending_messages WHERE username = ? ORDER BY id DESC LIMIT ?",
+            (username, limit),
+        ).fetchall()
+        return [(row_id, json.loads(payload)) for row_id, payload in reversed(rows)]
+
+    def read_batch(self, after_id: int, up_to_id: int, limit: int) -> List[Tuple[int, str, Dict]]:
+        """Pending messages of every user with after_id < id <= up_to_id, oldest first: (id, username, message)."""
+        rows = self._conn.execute(
+            "SELECT id, username, payload FROM pending_messages WHERE id > ? AND id <= ? ORDER BY id LIMIT ?",
+            (after_id, up_to_id, limit),
+        )
+        return [(row_id, username, json.loads(payload)) for row_id, username, payload in rows]
+
+    def ack(self, username: str, up_to_id: int) -> int:
+        """Truncate the journal of `username` up to (and including) `up_to_id`. Returns deleted rows."""
+        cur = self._conn.execute(
+            "DELETE FROM pending_messages WHERE username = ? AND id <= ?", (username, up_to_id)
+        )
+        return cur.rowcount
+
+    def count(self, username: str) -> int:
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM pending_messages WHERE username = ?", (username,)
+        ).fetchone()[0]
+
+    def last_id(self, username: Optional[str] = None) -> int:
+        """Newest journal id of `username` (of every user if None), 0 when empty."""
+        if username is None:
+            row = self._conn.execute("SELECT MAX(id) FROM pending_messages").fetchone()
+        else:
+            row = self._conn.execute(
+                "SELECT MAX(id) FROM pending_messages WHERE username = ?", (username,)
+            ).fetchone()
+        return row[0] or 0
+
+    def close(self):
+        self._conn.close()
+
+
+_journal: Optional[MessageJournal] = None
+
+
+def get_journal() -> MessageJournal:
+    """Process-wide journal, opened on first use."""
+    global _journal
+    if _journal is None:
+        _journal = MessageJournal()
+        logger.info(f"Opened message journal at {_journal.path}")
+    return _journal
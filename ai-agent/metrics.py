@@ -0,0 +1,50 @@
+from collections import deque
+from typing import Deque, Dict
+
+
+class LatencyStat:
+    """
+    Simple latency metric (seconds) kept in memory.
+    Keeps count/total/max over the whole lifetime and a bounded window of recent samples for percentiles.
+    """
+    def __init__(self, name: str, window: int = 500):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self._samples.append(seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """Percentile (0-100) over the recent window."""
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> Dict:
+        return {
+            "name": self.name,
+            "count": self.count,
+            "mean": round(self.mean, 4),
+            "p95": round(self.percentile(95), 4),
+            "max": round(self.max, 4),
+            "last": round(self.last, 4),
+        }
+
+
+class ValueStat(LatencyStat):
+    """Same statistics for plain values (batch sizes, bytes, ...) instead of seconds."""
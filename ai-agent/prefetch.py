@@ -0,0 +1,88 @@
+import time
+import asyncio
+import threading
+from typing import Callable, Coroutine, Dict, Optional
+from logger import logger
+from metrics import LatencyStat
+from file_index import FileIndex, get_file_index
+from client import async_client
+from utils import find_recent_pdfs_in_downloads, read_file_content
+from const import MODEL, PREFETCH_FILES, PREFETCH_BUDGET, LONG_DOC_MAX_CHARS
+
+# first process_file_request of a session, split by whether the join-time prefetch had finished
+first_request_prefetched = LatencyStat("first_file_request_prefetched")
+first_request_cold = LatencyStat("first_file_request_cold")
+
+
+class Prefetcher:
+    """
+    Join-time warm-up for one participant, run while the user is still greeting the agent:
+    refresh the Downloads index (the process-wide one by default, waiting for its load) and build its
+    fuzzy name index, open the connection to OpenAI and extract the text of the
+    `files` most recent PDFs into the text cache. Bounded by `budget` seconds and cancelled when
+    the participant leaves; an extraction already running in a worker thread stops at its next page.
+    """
+    def __init__(self, file_index: Optional[FileIndex] = None, files: int = PREFETCH_FILES, budget: float = PREFETCH_BUDGET):
+        self.file_index = file_index
+        self.files = files
+        self.budget = budget
+        self.done = False
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()  # seen by the extraction thread, which task.cancel() cannot reach
+        self._first_request_recorded = False
+
+    def start(self, spawn: Callable[[Coroutine], asyncio.Task] = asyncio.create_task) -> asyncio.Task:
+        """Run in the background; `spawn` lets the caller keep the task in its own task set."""
+        self._task = spawn(self._run())
+        return self._task
+
+    def cancel(self):
+        if self._task is not None and not self._task.done():
+            logger.info("Prefetch cancelled.")
+            self._stop.set()
+            self._task.cancel()
+
+    async def _run(self):
+        started = time.perf_counter()
+        warmed = 0
+        try:
+            async with asyncio.timeout(self.budget):
+                file_index = self.file_index or await asyncio.to_thread(get_file_index)
+                await asyncio.to_thread(file_index.warm)
+                try:
+                    # TLS handshake + keep-alive connection for the first routing call, no tokens spent
+                    await async_client.models.retrieve(MODEL)
+                except Exception as e:
+                    logger.warning(f"Prefetch could not reach OpenAI: {e}")
+                if self.files > 0:
+                    recent = await asyncio.to_thread(find_recent_pdfs_in_downloads)
+                    for info in recent[: self.files]:
+                        try:
+                            # summary-sized entry: the text cache serves the 8000-char raw read from its prefix
+                            await asyncio.to_thread(
+                                read_file_content, info["full_path"], LONG_DOC_MAX_CHARS, self._stop
+                            )
+                            warmed += 1
+                        except Exception as e:
+                            logger.warning(f"Prefetch skipped {info['file_name']}: {e}")
+            self.done = True
+            logger.info(f"Prefetch finished: {warmed} files warmed in {time.perf_counter() - started:.2f}s")
+        except TimeoutError:
+            logger.warning(f"Prefetch stopped after {self.budget}s budget ({warmed} files warmed)")
+        finally:
+            # budget expired or task cancelled: the awaited thread keeps running until it sees this
+            self._stop.set()
+
+    def record_first_request(self, seconds: float):
+        """Latency of the session's first file request; later requests are not counted."""
+        if self._first_request_recorded:
+            return
+        self._first_request_recorded = True
+        (first_request_prefetched if self.done else first_request_cold).observe(seconds)
+
+
+def stats() -> Dict:
+    return {
+        "prefetched": first_request_prefetched.snapshot(),
+        "cold": first_request_cold.snapshot(),
+    }
@@ -0,0 +1,107 @@
+import re
+import asyncio
+import hashlib
+from typing import Dict, List, Optional
+from logger import logger
+from const import SPEECH_CHUNK_CHARS, SPEECH_FIRST_CHUNK_CHARS
+
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？…])\s+|\n{2,}|\n(?=\s*[-•*\d])")
+
+
+def split_sentences(text: str, max_chars: int = SPEECH_CHUNK_CHARS, first_chars: int = SPEECH_FIRST_CHUNK_CHARS) -> List[str]:
+    """
+    Split text into speakable chunks on sentence boundaries.
+    Sentences are grouped up to max_chars (first_chars for the first chunk); longer sentences are cut at a space.
+    """
+    chunks: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text):
+        sentence = " ".join(sentence.split())
+        if not sentence:
+            continue
+        limit = first_chars if not chunks else max_chars
+        while len(sentence) > limit:
+            cut = sentence.rfind(" ", 0, limit)
+            if cut <= 0:
+                cut = limit
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+            limit = max_chars
+        if current and len(current) + 1 + len(sentence) > limit:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class ReadAloud:
+    """
+    Reads a document to the participant one chunk at a time through the AgentSession speech pipeline.
+    The position is kept per document, so a read interrupted by the user resumes at the interrupted chunk.
+    Only the chunks of the current document are held; other documents keep just their position.
+    """
+    def __init__(self):
+        self._positions: Dict[str, int] = {}  # document hash -> next chunk to speak
+        self._current: Optional[str] = None
+        self._chunks: List[str] = []  # chunks of the current document
+        self._task: Optional[asyncio.Task] = None
+        self._handle = None  # SpeechHandle of the chunk being spoken
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def start(self, session, text: str) -> int:
+        """Start (or resume) reading `text`. Returns the number of chunks left to read."""
+        key = self._key(text)
+        if key != self._current or not self._chunks:
+            self.stop()
+            self._chunks = split_sentences(text)
+            self._current = key
+        return self._play_from(session)
+
+    def resume(self, session) -> int:
+        """Continue the last document from where it stopped. Returns chunks left, 0 if nothing to resume."""
+        if self._current is None or self._current not in self._positions or not self._chunks:
+            return 0
+        return self._play_from(session)
+
+    def _play_from(self, session) -> int:
+        self.stop()
+        key = self._current
+        position = self._positions.get(key, 0)
+        if position >= len(self._chunks):
+            position = 0
+        self._positions[key] = position
+        self._task = asyncio.create_task(self._play(session, key, self._chunks, position))
+        return len(self._chunks) - position
+
+    async def _play(self, session, key: str, chunks: List[str], position: int):
+        for i in range(position, len(chunks)):
+            self._positions[key] = i
+            # only the tool call goes into the chat context, not every chunk of the document
+            self._handle = session.say(chunks[i], allow_interruptions=True, add_to_chat_ctx=False)
+            await self._handle
+            if self._handle.interrupted:
+                logger.info(f"Reading interrupted at chunk {i + 1}/{len(chunks)}")
+                return
+        logger.info(f"Finished reading {len(chunks)} chunks")
+        self._handle = None
+        self._positions.pop(key, None)
+        if self._current == key:
+            self._chunks = []
+
+    def stop(self):
+        # cancelling the driver alone leaves the queued chunk playing
+        if self._handle is not None and not self._handle.done():
+            self._handle.interrupt()
+        self._handle = None
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+USER = 0
+BOT = 1
+
+
+class StoredMessage:
+    """
+    Compact conversation message kept in memory.
+    Timestamps stay epoch milliseconds until the message is serialized to a CreateMessageDto.
+    """
+    __slots__ = ("sender_type", "content", "created_at", "id")
+
+    def __init__(self, sender_type: int, content: str, created_at: int, id: Optional[int] = None):
+        self.sender_type = sender_type
+        self.content = content
+        self.created_at = created_at  # epoch milliseconds, UTC
+        self.id = id  # backend message id, None until stored by backend
+
+    @classmethod
+    def now(cls, sender_type: int, content: str, created_at: Optional[datetime] = None) -> "StoredMessage":
+        created_at = created_at or datetime.now(timezone.utc)
+        return cls(sender_type, content, int(created_at.timestamp() * 1000))
+
+    @classmethod
+    def from_dto(cls, dto: Dict) -> "StoredMessage":
+        """Build from a CreateMessageDto / MessageDto dict (camelCase or PascalCase keys)."""
+        created = dto.get("createdAt") or dto.get("CreatedAt")
+        try:
+            created_at = datetime.fromisoformat(created)
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            created_ms = int(created_at.timestamp() * 1000)
+        except (TypeError, ValueError):
+            created_ms = 0
+        sender_type = dto.get("senderType", dto.get("SenderType"))
+        content = dto.get("content") or dto.get("Content") or ""
+        return cls(sender_type, content, created_ms, dto.get("id", dto.get("Id")))
+
+    def to_dto(self) -> Dict:
+        """CreateMessageDto shape sent to backend."""
+        return {
+            "senderType": self.sender_type,
+            "content": self.content,
+            "createdAt": datetime.fromtimestamp(self.created_at / 1000, timezone.utc).isoformat(),
+        }
+
+    def __repr__(self) -> str:
+        return f"StoredMessage({self.sender_type}, {self.content!r})"
+
+
+class PairView:
+    """
+    Read-only {"user": ..., "bot": ...} view over two StoredMessage objects.
+    No text is copied: the pair points at the same message objects the cache holds.
+    """
+    __slots__ = ("user_message", "bot_message")
+
+    def __init__(self, user_message: StoredMessage, bot_message: StoredMessage):
+        self.user_message = user_message
+        self.bot_message = bot_message
+
+    @property
+    def user(self) -> str:
+        return self.user_message.content
+
+    @property
+    def bot(self) -> str:
+        return self.bot_message.content
+
+    # dict-style access so existing callers (pair.get("user"), pair["bot"]) keep working
+    def __getitem__(self, key: str) -> str:
+        if key == "user":
+            return self.user
+        if key == "bot":
+            return self.bot
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self) -> str:
+        return repr({"user": self.user, "bot": self.bot})
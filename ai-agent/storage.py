@@ -1,73 +1,99 @@
 # ai-agent/storage.py
 import os
-import time
-import requests
-from datetime import datetime, timezone
-from typing import List, Dict, Optional
+import asyncio
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple, Deque
 from dotenv import load_dotenv
-from const import PAIRS_TO_FLUSH
+from logger import logger
+from journal import MessageJournal, get_journal
+from records import StoredMessage, PairView, USER, BOT
+from flush_coalescer import FlushCoalescer, get_coalescer
+from backend_client import BACKEND_BASE, request_as
+from const import PAIRS_TO_FLUSH, LAST_N_PAIRS, FLUSH_DRAIN_TIMEOUT, HISTORY_MAX_PAGES, HISTORY_PAGE_CACHE_SIZE
 
 load_dotenv()
 
-BACKEND_BASE = os.getenv("BACKEND_BASE_URL")  # chỉnh nếu khác
 LOGIN_USERNAME = os.getenv("AGENT_LOGIN_USERNAME")  # tạo account này trong backend
 # Nếu backend yêu cầu password, chỉnh code và DTO. (current backend LoginDto chỉ has Username)
 
+# (username, query params) -> (ETag, messages) of the last history page seen, shared by all sessions.
+# LRU bounded to HISTORY_PAGE_CACHE_SIZE pages so it does not grow with every user the worker served.
+_history_pages: "OrderedDict[Tuple[str, Tuple], Tuple[str, List[StoredMessage]]]" = OrderedDict()
+
 class ConversationCache:
     """
-    Keep an in-memory buffer of messages (CreateMessageDto shape)
-    Buffer will be flushed to backend when we've accumulated `pairs_to_flush` pairs (user+bot).
+    Buffer messages (CreateMessageDto shape) of one session until they are sent to backend.
+    Every message is written to the local journal, so nothing is lost if the worker dies or backend is down:
+    the journal is replayed at startup and truncated once backend acknowledged a batch.
+    When we've accumulated `pairs_to_flush` pairs (user+bot) the session asks the worker-level
+    FlushCoalescer to send; the conversation handler never waits on backend.
+    Context pairs are served from a fixed-size window of completed pairs: history is fetched once
+    when the session is seeded, then every new message updates the window in place.
     """
-    def __init__(self, username: str, pairs_to_flush: int = PAIRS_TO_FLUSH):
+    def __init__(
+        self,
+        username: str,
+        pairs_to_flush: int = PAIRS_TO_FLUSH,
+        journal: Optional[MessageJournal] = None,
+        coalescer: Optional[FlushCoalescer] = None,
+        window_pairs: int = LAST_N_PAIRS,
+    ):
         self.username = username
         self.pairs_to_flush = pairs_to_flush
-        self._pending_messages: List[Dict] = []  # list of CreateMessageDto: {SenderType, Content, CreatedAt}
+        self.journal = journal or get_journal()
+        self.coalescer = coalescer or get_coalescer()
         self._pair_count = 0
-        self._token: Optional[str] = None
-        self._token_expiry = 0  # epoch seconds; simplistic - you can set long expiry
-        self.session = requests.Session()
-
-    # --- HTTP helpers ---
-    def _login_if_needed(self):
-        # naive caching of token (no expiry check from backend); re-login if token missing
-        if self._token and time.time() < self._token_expiry:
-            return
-        url = f"{BACKEND_BASE}/api/account/login"
-        payload = {"username": self.username}
-        resp = self.session.post(url, json=payload, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        # backend returns { Message, User: { Username, Token } } per controller
-        token = None
-        if isinstance(data, dict):
-            u = data.get("User") or data.get("user") or {}
-            token = u.get("Token") or u.get("token")
-        if not token:
-            raise RuntimeError("Login did not return token. Response: " + str(data))
-        self._token = token
-        # set expiry to +1 hour by default (adjust as needed)
-        self._token_expiry = time.time() + 3600
-
-    def _auth_headers(self) -> Dict[str, str]:
-        self._login_if_needed()
-        return {"Authorization": f"Bearer {self._token}"}
+        self._unrequested = 0  # messages journaled since the last flush request
+        self._closed = False
+        # ring buffer of the latest completed pairs (views over StoredMessage), oldest first
+        self._pairs: Deque[PairView] = deque(maxlen=window_pairs)
+        self._open_user: Optional[StoredMessage] = None  # user message waiting for the agent reply
+        self._seeded = False
+        self._seed_lock = asyncio.Lock()
+        self.context_hits = 0  # get_last_n_pairs served from the window
+        self.context_misses = 0  # get_last_n_pairs that had to fetch history from backend
+        self._replay_journal()
 
     # --- API calls ---
-    def get_history_messages(self) -> List[Dict]:
+    async def get_history_messages(
+        self,
+        limit: Optional[int] = None,
+        before: Optional[int] = None,
+        since: Optional[int] = None,
+    ) -> List[StoredMessage]:
         """
-        Fetch conversation history (all messages) from backend for the logged-in user.
-        Returns list of message DTOs (MessageDto) or [].
+        Fetch conversation history from backend for the logged-in user, oldest first.
+        Backend orders and limits in the database: last `limit` messages, optionally only
+        older than message id `before` or newer than message id `since`.
+        Unchanged pages are answered with 304 and served from the local copy.
+        Returns list of StoredMessage or [].
         """
-        limit = 2*self.pairs_to_flush
-        url = f"{BACKEND_BASE}/api/conversation-history?limit={limit}"
-        resp = self.session.get(url, headers=self._auth_headers(), timeout=10)
+        params = {"limit": limit or 2*self.pairs_to_flush}
+        if before is not None:
+            params["before"] = before
+        if since is not None:
+            params["since"] = since
+        url = f"{BACKEND_BASE}/api/conversation-history"
+        key = (self.username, tuple(sorted(params.items())))
+        cached = _history_pages.get(key)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        resp = await request_as(self.username, "GET", url, params=params, headers=headers)
+        if resp.status_code == 304 and cached:
+            _history_pages.move_to_end(key)
+            return cached[1]
         resp.raise_for_status()
         data = resp.json()
         # controller returns conversation history DTO with Messages property
-        messages = data.get("messages") or data.get("Messages") or []
+        messages = [StoredMessage.from_dto(m) for m in data.get("messages") or data.get("Messages") or []]
+        if resp.headers.get("ETag"):
+            _history_pages[key] = (resp.headers["ETag"], messages)
+            _history_pages.move_to_end(key)
+            while len(_history_pages) > HISTORY_PAGE_CACHE_SIZE:
+                _history_pages.popitem(last=False)
         return messages
 
-    def post_messages(self, messages: List[Dict]) -> List[Dict]:
+    async def post_messages(self, messages: List[Dict]) -> List[Dict]:
         """
         Send list of CreateMessageDto to backend. Returns created messages.
         Each message: { "senderType": int, "content": str, "createdAt": "2025-11-15T..."}
@@ -75,138 +101,143 @@ class ConversationCache:
         if not messages:
             return []
         url = f"{BACKEND_BASE}/api/messages"
-        resp = self.session.post(url, json=messages, headers=self._auth_headers(), timeout=10)
+        resp = await request_as(self.username, "POST", url, json=messages)
         resp.raise_for_status()
         return resp.json()
 
     # --- Cache operations ---
-    def add_user_message(self, content: str, created_at: Optional[datetime] = None):
-        created_at = created_at or datetime.now(timezone.utc)
-        dto = {
-            "senderType": 0,
-            "content": content,
-            "createdAt": created_at.isoformat()
-        }
-        self._pending_messages.append(dto)
+    def _append(self, message: StoredMessage):
+        # serialized to CreateMessageDto only here, at the journal boundary
+        self.journal.append(self.username, message.to_dto())
+        self._unrequested += 1
+
+    def add_user_message(self, content: str, created_at: Optional[datetime] = None) -> StoredMessage:
+        message = StoredMessage.now(USER, content, created_at)
+        self._append(message)
+        self._track_pair(message)
         # don't increment pair yet; pair completes when agent adds response
         # but for simplification, we can mark that a user message is added
-        return dto
-
-    def add_agent_message(self, content: str, created_at: Optional[datetime] = None):
-        created_at = created_at or datetime.now(timezone.utc)
-        dto = {
-            "senderType": 1,
-            "content": content,
-            "createdAt": created_at.isoformat()
-        }
-        self._pending_messages.append(dto)
+        return message
+
+    def add_agent_message(self, content: str, created_at: Optional[datetime] = None) -> StoredMessage:
+        message = StoredMessage.now(BOT, content, created_at)
+        self._append(message)
+        self._track_pair(message)
         # a full pair just completed (user + agent)
         self._pair_count += 1
-        # flush if reached threshold
+        # flush if reached threshold (in background, never awaited here)
         if self._pair_count >= self.pairs_to_flush:
-            self.flush()
-        return dto
+            self.schedule_flush()
+        return message
 
-    def flush(self):
-        if not self._pending_messages:
-            return []
+    # --- Flush ---
+    def _replay_journal(self):
+        """Rebuild the pair window from messages a previous run left in the journal and schedule sending them."""
+        pending = self.journal.count(self.username)
+        if not pending:
+            return
+        for _, dto in self.journal.read_tail(self.username, 2 * self._pairs.maxlen):
+            self._track_pair(StoredMessage.from_dto(dto))
+        logger.info(f"Replaying {pending} journaled messages for '{self.username}'.")
+        self._unrequested = pending
         try:
-            created = self.post_messages(self._pending_messages)
-        except Exception as e:
-            print("Flush failed:", e)
-            return []
-        # Xóa cache khi gửi thành công
-        self._pending_messages = []
-        self._pair_count = 0
-        return created
-
-
-    # def get_last_n_pairs(self, n_pairs: int = 5) -> List[Dict]:
-    #     """
-    #     Return the last n_pairs from backend as list of {"user": "...", "bot": "..."}.
-    #     If total messages are odd (missing last bot), we ignore the incomplete tail.
-    #     """
-    #     messages = self.get_history_messages()
-    #     if not messages:
-    #         return []
-    #     # messages are presumably ordered by CreatedAt ascending (check ordering, else sort)
-    #     # ensure ordering:
-    #     def key_fn(m):
-    #         return m.get("createdAt") or m.get("CreatedAt") or ""
-    #     try:
-    #         messages_sorted = sorted(messages, key=lambda m: key_fn(m))
-    #     except Exception:
-    #         messages_sorted = messages
-
-    #     # take last 2*n_pairs messages
-    #     tail = messages_sorted[-(2 * n_pairs):] if len(messages_sorted) >= 2 * n_pairs else messages_sorted
-    #     # convert to pairs
-    #     pairs = []
-    #     i = 0
-    #     while i + 1 < len(tail):
-    #         a = tail[i]
-    #         b = tail[i + 1]
-    #         # ensure a is user and b is bot; if not, try to align by scanning
-    #         if a.get("senderType", a.get("SenderType", None)) == 0 and b.get("senderType", b.get("SenderType", None)) == 1:
-    #             pairs.append({"user": a.get("content") or a.get("Content"), "bot": b.get("content") or b.get("Content")})
-    #             i += 2
-    #         else:
-    #             # shift by 1 to try align
-    #             i += 1
-    #     # return the last n_pairs (might be <= n_pairs)
-    #     return pairs[-n_pairs:]
-
-    def get_last_n_pairs(self, n_pairs: int = PAIRS_TO_FLUSH) -> List[Dict]:
-        """
-        Return last n_pairs using:
-        1) pending cache pairs (newest)
-        2) only the required remaining pairs from database
-        """
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no loop yet: sent with the next flush
+        self.schedule_flush()
 
-        # ---- STEP 1: Build pairs from cache ----
-        cache_pairs = self._extract_pairs_from_messages(self._pending_messages)
+    def schedule_flush(self) -> bool:
+        """Ask the worker-level coalescer to send this session's journal, without waiting."""
+        self._pair_count = 0
+        if not self._unrequested:
+            return False
+        self.coalescer.request_flush(self._unrequested)
+        self._unrequested = 0
+        return True
 
-        num_cache_pairs = len(cache_pairs)
-        if num_cache_pairs >= n_pairs:
-            # Cache đủ → chỉ cần lấy từ cache, không cần query DB
-            return cache_pairs[-n_pairs:]
+    async def flush(self):
+        """Send everything journaled so far and wait until backend acknowledged it."""
+        self._pair_count = 0
+        self._unrequested = 0
+        await self.coalescer.flush()
 
-        # ---- STEP 2: Need additional pairs from DB ----
-        needed = n_pairs - num_cache_pairs
+    async def aclose(self, timeout: float = FLUSH_DRAIN_TIMEOUT):
+        """
+        Drain pending messages to backend. Call when the participant disconnects.
+        Whatever could not be sent stays in the journal and is replayed next time.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except Exception as e:
+            logger.warning(f"Could not drain conversation cache for '{self.username}': {e}")
+        remaining = self.journal.count(self.username)
+        if remaining:
+            logger.warning(f"{remaining} unsent messages for '{self.username}' kept in the journal.")
+        logger.info(
+            f"Context window for '{self.username}': {self.context_hits} hits, {self.context_misses} misses"
+        )
 
-        # Query database ONLY for needed pairs → not entire history
-        db_pairs = self._get_last_db_pairs(needed)
+    # --- Context window ---
+    def _track_pair(self, message: StoredMessage):
+        """Update the pair window with one new message (same pairing rule as _extract_pairs_from_messages)."""
+        if message.sender_type == USER:
+            self._open_user = message
+        elif self._open_user is not None:
+            self._pairs.append(PairView(self._open_user, message))
+            self._open_user = None
 
-        # ---- STEP 3: Combine (cache is newer, DB older) ----
-        combined = db_pairs + cache_pairs
-        
-        print("Cache pairs:", cache_pairs)
-        print("DB pairs:", db_pairs)
-        print("Combined pairs:", combined)
+    async def load_history(self):
+        """Seed the pair window from backend once; pairs added since then are newer and kept after it."""
+        async with self._seed_lock:
+            if self._seeded:
+                return
+            db_pairs = await self._get_last_db_pairs(self._pairs.maxlen)
+            live_pairs = list(self._pairs)
+            # replayed journal messages may already have reached backend before seeding; journaled
+            # messages have no backend id yet, so match on text and timestamp (two "yes"/"Okay." turns are distinct)
+            live_keys = {self._pair_key(p) for p in live_pairs}
+            db_pairs = [p for p in db_pairs if self._pair_key(p) not in live_keys]
+            self._pairs.clear()
+            self._pairs.extend(db_pairs + live_pairs)
+            self._seeded = True
 
-        return combined[-n_pairs:]
+    @staticmethod
+    def _pair_key(pair: PairView) -> Tuple:
+        return (pair.user_message.created_at, pair.user, pair.bot_message.created_at, pair.bot)
 
+    async def get_last_n_pairs(self, n_pairs: int = PAIRS_TO_FLUSH) -> List[PairView]:
+        """
+        Return last n_pairs (at most the window size) from the in-memory pair window.
+        Pairs are read-only views supporting pair["user"] / pair.get("bot").
+        Only the first call of a session goes to backend to seed the window.
+        """
+        if self._seeded:
+            self.context_hits += 1
+        else:
+            self.context_misses += 1
+            await self.load_history()
+        return list(self._pairs)[-n_pairs:]
 
-    def _get_last_db_pairs(self, needed_pairs: int) -> List[Dict]:
+    async def _get_last_db_pairs(self, needed_pairs: int) -> List[PairView]:
         """
         Fetch only the minimal required number of messages from the database.
+        If the tail does not pair up (e.g. unanswered user messages), page further back with the `before` cursor.
         """
-        messages = self.get_history_messages()
-
-        if not messages:
-            return []
-
-        # Sort messages by CreatedAt
-        def key_fn(m): 
-            return m.get("createdAt") or ""
-        messages_sorted = sorted(messages, key=key_fn)
-
-        # Take exactly needed pairs → 2*needed messages
-        tail = messages_sorted[-(2 * needed_pairs):]
-        return self._extract_pairs_from_messages(tail)
-
+        page_size = 2 * needed_pairs
+        messages: List[StoredMessage] = []
+        for _ in range(HISTORY_MAX_PAGES):
+            oldest_id = messages[0].id if messages else None
+            page = await self.get_history_messages(limit=page_size, before=oldest_id)
+            messages = page + messages
+            pairs = self._extract_pairs_from_messages(messages)
+            if len(pairs) >= needed_pairs or len(page) < page_size:
+                break
+        return self._extract_pairs_from_messages(messages)[-needed_pairs:]
 
-    def _extract_pairs_from_messages(self, msgs: List[Dict]) -> List[Dict]:
+    def _extract_pairs_from_messages(self, msgs: List[StoredMessage]) -> List[PairView]:
         """
         Convert sequential messages into pairs like:
         {"user": "...", "bot": "..."}
@@ -215,9 +246,9 @@ class ConversationCache:
         i = 0
         while i + 1 < len(msgs):
             a, b = msgs[i], msgs[i+1]
-            if (a.get("senderType") == 0 
-                and b.get("senderType") == 1):
-                pairs.append({"user": a["content"], "bot": b["content"]})
+            if (a.sender_type == USER
+                and b.sender_type == BOT):
+                pairs.append(PairView(a, b))
                 i += 2
             else:
                 i += 1
@@ -0,0 +1,116 @@
+import os
+import time
+import sqlite3
+import hashlib
+from typing import Dict, Optional
+from logger import logger
+from const import SUMMARY_CACHE_PATH, SUMMARY_CACHE_MAX_ENTRIES, SUMMARY_CACHE_MAX_BYTES
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """
+    On-disk cache of LLM summaries, keyed by (hash of the extracted text, max_words, model).
+    The same document asked again (same or another session, after a restart) is answered without an LLM call.
+    Least recently used rows are evicted when the cache grows past max_entries or max_bytes.
+    """
+    def __init__(
+        self,
+        path: str = SUMMARY_CACHE_PATH,
+        max_entries: int = SUMMARY_CACHE_MAX_ENTRIES,
+        max_bytes: int = SUMMARY_CACHE_MAX_BYTES,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS summaries (
+                content_hash TEXT NOT NULL,
+                max_words INTEGER NOT NULL,
+                model TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (content_hash, max_words, model)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_summaries_last_used ON summaries (last_used)")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, text_hash: str, max_words: int, model: str) -> Optional[str]:
+        key = (text_hash, max_words, model)
+        row = self._conn.execute(
+            "SELECT summary FROM summaries WHERE content_hash = ? AND max_words = ? AND model = ?", key
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._conn.execute(
+            "UPDATE summaries SET last_used = ? WHERE content_hash = ? AND max_words = ? AND model = ?",
+            (time.time(),) + key,
+        )
+        return row[0]
+
+    def put(self, text_hash: str, max_words: int, model: str, summary: str):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO summaries (content_hash, max_words, model, summary, size, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (text_hash, max_words, model, summary, len(summary.encode("utf-8")), time.time()),
+        )
+        self._evict()
+
+    def _evict(self):
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        evicted = 0
+        for rowid, size in self._conn.execute("SELECT rowid, size FROM summaries ORDER BY last_used").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM summaries WHERE rowid = ?", (rowid,))
+            count -= 1
+            total -= size
+            evicted += 1
+        self.evictions += evicted
+        logger.info(f"Summary cache evicted {evicted} entries")
+
+    def stats(self) -> Dict:
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+_summary_cache: Optional[SummaryCache] = None
+
+
+def get_summary_cache() -> SummaryCache:
+    """Process-wide summary cache, opened on first use."""
+    global _summary_cache
+    if _summary_cache is None:
+        _summary_cache = SummaryCache()
+        logger.info(f"Opened summary cache at {_summary_cache.path}")
+    return _summary_cache
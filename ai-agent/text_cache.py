@@ -0,0 +1,174 @@
+import os
+import mmap
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional
+from logger import logger
+from const import TEXT_CACHE_DIR, TEXT_CACHE_MAX_BYTES
+
+
+class TextCache:
+    """
+    Persistent store of text extracted from PDF/DOCX files, keyed by (path, mtime, size).
+    Text lives in one UTF-8 file per document under TEXT_CACHE_DIR and is read back through mmap;
+    an SQLite table keeps the metadata used for staleness checks and LRU eviction (total size capped).
+    An entry whose file changed on disk (different mtime or size) is dropped on the next lookup.
+    """
+    def __init__(self, directory: str = TEXT_CACHE_DIR, max_bytes: int = TEXT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "index.sqlite3"), timeout=5, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS texts (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                char_limit INTEGER,
+                bytes INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_texts_last_used ON texts (last_used)")
+        self._lock = threading.Lock()  # extraction runs in asyncio.to_thread workers
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def _text_path(self, path: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(path.encode("utf-8")).hexdigest() + ".txt")
+
+    def _drop(self, path: str):
+        self._conn.execute("DELETE FROM texts WHERE path = ?", (path,))
+        try:
+            os.remove(self._text_path(path))
+        except FileNotFoundError:
+            pass
+
+    def get(self, path: str, max_chars: Optional[int] = None) -> Optional[str]:
+        """
+        Cached text of `path` cut to `max_chars`, None on a miss.
+        A truncated entry only serves requests it is long enough for.
+        """
+        with self._lock:
+            return self._get(path, max_chars)
+
+    def _get(self, path: str, max_chars: Optional[int]) -> Optional[str]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        row = self._conn.execute(
+            "SELECT mtime, size, char_limit FROM texts WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        mtime, size, char_limit = row
+        if mtime != st.st_mtime or size != st.st_size:
+            # file changed since it was extracted
+            self.stale += 1
+            self.misses += 1
+            self._drop(path)
+            return None
+        if char_limit is not None and (max_chars is None or max_chars > char_limit):
+            self.misses += 1
+            return None
+        try:
+            text = self._read(self._text_path(path), max_chars)
+        except (OSError, ValueError):
+            self.misses += 1
+            self._drop(path)
+            return None
+        self.hits += 1
+        self._conn.execute("UPDATE texts SET last_used = ? WHERE path = ?", (time.time(), path))
+        return text
+
+    @staticmethod
+    def _read(text_path: str, max_chars: Optional[int]) -> str:
+        with open(text_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if max_chars is None:
+                    return mm[:].decode("utf-8")
+                # a UTF-8 char is at most 4 bytes: decode only the prefix that can be needed
+                return mm[: max_chars * 4].decode("utf-8", errors="ignore")[:max_chars]
+
+    def put(self, path: str, text: str, char_limit: Optional[int] = None, stat: Optional[os.stat_result] = None):
+        """
+        Store the text extracted from `path`; `char_limit` is the limit extraction stopped at (None: whole file).
+        `stat` should be taken before extraction so a file modified meanwhile is not cached under its new mtime.
+        """
+        with self._lock:
+            self._put(path, text, char_limit, stat)
+
+    def _put(self, path: str, text: str, char_limit: Optional[int], st: Optional[os.stat_result]):
+        if st is None:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return
+        data = text.encode("utf-8")
+        text_path = self._text_path(path)
+        tmp_path = text_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, text_path)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO texts (path, mtime, size, char_limit, bytes, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (path, st.st_mtime, st.st_size, char_limit, len(data), time.time()),
+        )
+        self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM texts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for path, size in self._conn.execute("SELECT path, bytes FROM texts ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._drop(path)
+            total -= size
+            evicted += 1
+        self.evictions += evicted
+        logger.info(f"Text cache evicted {evicted} documents")
+
+    def stats(self) -> Dict:
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM texts").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "documents": count,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+_text_cache: Optional[TextCache] = None
+
+
+def get_text_cache() -> TextCache:
+    """Process-wide extracted-text cache, opened on first use."""
+    global _text_cache
+    if _text_cache is None:
+        _text_cache = TextCache()
+        logger.info(f"Opened text cache at {_text_cache.directory}")
+    return _text_cache
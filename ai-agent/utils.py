@@ -1,118 +1,152 @@
 import os
-import requests
+import re
+import threading
+from typing import Dict, Optional, Tuple
 from logger import logger
 from const import MODEL
-from client import client
-from const import DOWNLOADS_PATH
-from PyPDF2 import PdfReader
-from docx import Document
+from const import DOWNLOADS_PATH, SUPPORTED_EXTS
+from extraction import extract_text, ExtractionCancelled
 from datetime import datetime, timedelta
+from file_index import get_file_index
+from text_cache import get_text_cache
+from backend_client import BACKEND_BASE, credentials, get_http_client, token_from_response
+from flush_coalescer import get_coalescer
 
 
 
 model = MODEL
 downloads_path = DOWNLOADS_PATH
 
-BACKEND_BASE = os.getenv("BACKEND_BASE_URL")
 
 
+_audio_numbers: Dict[str, int] = {}  # output_dir -> last allocated number
+_audio_numbers_lock = threading.Lock()
+
+def _max_audio_number(output_dir: str) -> int:
+    max_num = 0
+    for f in os.listdir(output_dir):
+        stem, ext = os.path.splitext(f)
+        # ignore anything that is not "<number>.mp3" instead of crashing on it
+        if ext == ".mp3" and stem.isdigit():
+            max_num = max(max_num, int(stem))
+    return max_num
 
 def get_next_filename(output_dir: str) -> str:
     """
-    Check the output directory for existing audio files and determine the next available filename.
+    Reserve the next "<number>.mp3" in the output directory and return its path.
+    The directory is listed once per process; after that numbers come from a counter and each file is
+    created with O_EXCL, so concurrent calls (threads or other processes) never get the same name.
     """
     if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+        os.makedirs(output_dir, exist_ok=True)
         logger.info(f"Make dir: {output_dir}")
 
-    # Lọc file .mp3 và lấy phần số
-    existing_files = [
-        f for f in os.listdir(output_dir)
-        if f.endswith(".mp3")
-    ]
-
-    if existing_files:
-        max_num = max(int(f[:-4]) for f in existing_files)
-    else:
-        max_num = 0
-
-    next_num = max_num + 1
-    next_filename = os.path.join(output_dir, f"{next_num}.mp3")
-    return next_filename
+    with _audio_numbers_lock:
+        if output_dir not in _audio_numbers:
+            _audio_numbers[output_dir] = _max_audio_number(output_dir)
+        while True:
+            _audio_numbers[output_dir] += 1
+            next_filename = os.path.join(output_dir, f"{_audio_numbers[output_dir]}.mp3")
+            try:
+                fd = os.open(next_filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue  # taken by another process
+            os.close(fd)
+            return next_filename
+
+# "Please read the following:", "Can you say this out loud:", "Đọc đoạn sau:" ... at the very start of the text,
+# up to the first ':' or line break; it never runs past the end of a sentence, so text that merely contains a colon is left alone
+_REQUEST_HEAD = re.compile(
+    r"\s*(?:(?:please|kindly|can you|could you|would you|hãy|làm ơn|vui lòng)\s+)*"
+    r"(?:read|say|speak|pronounce|narrate|convert|đọc|nói)\b[^:\n.!?]{0,80}[:\n]",
+    re.IGNORECASE,
+)
+_WRAPPING_QUOTES = re.compile(r'^\s*["“\'](.*)["”\']\s*$', re.DOTALL)
 
 def return_text_to_speech(text: str) -> str:
-    """Remove the request part from the text."""
+    """
+    Remove the request part from the text.
+    Deterministic: strips a leading spoken request ("Please read this:") and wrapping quotes, no LLM call.
+
+    >>> return_text_to_speech("Read the following text for me:\\n  Technology has changed.")
+    'Technology has changed.'
+    >>> return_text_to_speech('Please read this: "Hello there."')
+    'Hello there.'
+    >>> return_text_to_speech("Technology has changed. Read more: here")
+    'Technology has changed. Read more: here'
+    >>> return_text_to_speech("Note: read carefully.")
+    'Note: read carefully.'
+    """
     logger.info("Extracting text to be converted to speech...")
-    
-    prompt = (
-        f"""Remove any request part and return only the text to be read from the following input:\n\n{text}"""
-    )
-    completion = client.beta.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant that removes the request parts."},
-            {"role": "user", "content": prompt},
-        ]
-    )
-    return completion.choices[0].message.content.strip()
+    stripped = text
+    head = _REQUEST_HEAD.match(text)
+    if head and text[head.end():].strip():
+        stripped = text[head.end():]
+    quoted = _WRAPPING_QUOTES.match(stripped)
+    if quoted:
+        stripped = quoted.group(1)
+    return stripped.strip()
 
 def find_file_in_downloads(filename: str) -> str:
     """
     Search for a file by name in the user's Downloads folder.
     Returns the full path if found, otherwise raises FileNotFoundError.
+    Lookup goes through the persistent file index instead of walking the folder;
+    a name transcribed from speech ("quarterly report final") falls back to fuzzy matching.
     """
-    for root, _, files in os.walk(downloads_path):
-        for f in files:
-            if f.lower() == filename.lower():
-                return os.path.join(root, f)
+    path, candidates = get_file_index().resolve(filename)
+    if path:
+        if candidates and candidates[0][0] < 1.0:
+            logger.info(f"Fuzzy matched '{filename}' -> {os.path.basename(path)} (score {candidates[0][0]})")
+        return path
+    if candidates:
+        names = ", ".join(os.path.basename(p) for _, p in candidates[:3])
+        raise FileNotFoundError(f"File '{filename}' not found in Downloads folder. Did you mean: {names}?")
     raise FileNotFoundError(f"File '{filename}' not found in Downloads folder.")
 
-def read_file_content(filepath: str, max_chars: int = 8000) -> str:
+def read_file_content(filepath: str, max_chars: int = 8000, cancel: Optional[threading.Event] = None) -> str:
     """
     Read text file safely (supports .txt, .md, .csv, .json, .pdf, .docx).
     Truncates if too large to avoid overloading the model.
+    Setting `cancel` stops a PDF/DOCX extraction between pages (ExtractionCancelled, nothing cached).
     """
+    return _read_text(filepath, max_chars, cancel).strip()
+
+def read_file_prefix(filepath: str, max_chars: int = 8000) -> Tuple[str, bool]:
+    """Like read_file_content, plus whether the document goes on past the returned text."""
+    # one char past the budget tells a cut text from a document that is exactly max_chars long
+    text = _read_text(filepath, max_chars + 1)
+    return text[:max_chars].strip(), len(text) > max_chars
+
+def _read_text(filepath: str, max_chars: int, cancel: Optional[threading.Event] = None) -> str:
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"File not found: {filepath}")
 
     ext = os.path.splitext(filepath)[1].lower()
-    supported_exts = [".txt", ".md", ".csv", ".json", ".pdf", ".docx"]
+    supported_exts = list(SUPPORTED_EXTS)
     if ext not in supported_exts:
         raise ValueError(f"Unsupported file type '{ext}'. Supported: {supported_exts}")
 
-    # --- Handle PDF ---
-    if ext == ".pdf":
-        text_content = ""
+    # --- Handle PDF / DOCX: parsing is slow, reuse the text extracted last time ---
+    if ext in (".pdf", ".docx"):
+        text_cache = get_text_cache()
+        cached = text_cache.get(filepath, max_chars)
+        if cached is not None:
+            return cached
+        st = os.stat(filepath)
         try:
-            reader = PdfReader(filepath)
-            for page in reader.pages:
-                page_text = page.extract_text() or ""
-                text_content += page_text
-                if len(text_content) > max_chars:
-                    text_content = text_content[:max_chars]
-                    break
+            # pages/paragraphs are streamed and extraction stops once max_chars is reached
+            text_content, truncated = extract_text(filepath, max_chars, cancel=cancel)
+        except ExtractionCancelled:
+            raise
         except Exception as e:
-            raise ValueError(f"Error reading PDF: {e}")
-        return text_content.strip()
-
-    # --- Handle DOCX ---
-    if ext == ".docx":
-        text_content = ""
-        try:
-            doc = Document(filepath)
-            for para in doc.paragraphs:
-                text_content += para.text + "\n"
-                if len(text_content) > max_chars:
-                    text_content = text_content[:max_chars]
-                    break
-        except Exception as e:
-            raise ValueError(f"Error reading DOCX: {e}")
-        return text_content.strip()
+            raise ValueError(f"Error reading {ext[1:].upper()}: {e}")
+        text_cache.put(filepath, text_content, char_limit=max_chars if truncated else None, stat=st)
+        return text_content
 
     # --- Handle Plain Text Files ---
     with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-        content = f.read(max_chars)
-    return content.strip()
+        return f.read(max_chars)
 
 def find_recent_pdfs_in_downloads(days: int = 7):
     """
@@ -126,25 +160,9 @@ def find_recent_pdfs_in_downloads(days: int = 7):
         "modified_time": datetime
     }
     """
-    recent_files = []
-    now = datetime.now()
-    cutoff_time = now - timedelta(days=days)
-
-    for root, _, files in os.walk(DOWNLOADS_PATH):
-        for f in files:
-            if f.lower().endswith(".pdf"):
-                file_path = os.path.join(root, f)
-                try:
-                    modified_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                    if modified_time >= cutoff_time:
-                        recent_files.append({
-                            "file_name": f,
-                            "full_path": file_path,
-                            "modified_time": modified_time
-                        })
-                except Exception as e:
-                    print(f"Error while accessing {file_path}: {e}")
-    recent_files.sort(key=lambda x: x["modified_time"], reverse=True)
+    cutoff_time = datetime.now() - timedelta(days=days)
+    # newest first straight from the index's mtime order, stops at the cutoff
+    recent_files = get_file_index().recent(exts=(".pdf",), since=cutoff_time.timestamp())
 
     return recent_files
 
@@ -158,21 +176,18 @@ def get_nth_file_info(number: int) -> str:
     else:
         return recent_files[-1]
 
-def ensure_user_exists(username: str):
+async def ensure_user_exists(username: str):
     """
     Ensure the user exists in backend.
     If not, auto-register the user.
+    Uses the shared connection pool; the token from login/register is kept in the shared credential cache.
     """
     # Try login first
     try:
-        resp = requests.post(
-            f"{BACKEND_BASE}/api/account/login",
-            json={"username": username},
-            timeout=5
-        )
-        if resp.status_code == 200:
-            print(f"[INFO] User '{username}' already exists (login OK).")
-            return True
+        await credentials.get_token(username)
+        print(f"[INFO] User '{username}' already exists (login OK).")
+        get_coalescer().user_registered(username)
+        return True
     except Exception as e:
         print(f"[WARNING] Login attempt failed: {e}")
 
@@ -180,7 +195,7 @@ def ensure_user_exists(username: str):
     print(f"[INFO] User '{username}' does NOT exist. Registering...")
 
     try:
-        resp = requests.post(
+        resp = await get_http_client().post(
             f"{BACKEND_BASE}/api/account/register",
             json={"username": username},
             timeout=5
@@ -188,6 +203,10 @@ def ensure_user_exists(username: str):
 
         if resp.status_code >= 200 and resp.status_code < 300:
             print(f"[SUCCESS] User '{username}' registered.")
+            token = token_from_response(resp.json())
+            if token:
+                credentials.store(username, token)
+            get_coalescer().user_registered(username)
             return True
 
         print(f"[ERROR] Registration failed: {resp.text}")
@@ -0,0 +1,130 @@
+import io
+import time
+import base64
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from PIL import Image
+from livekit import rtc
+from logger import logger
+from metrics import LatencyStat, ValueStat
+from const import VISION_MAX_EDGE, VISION_JPEG_QUALITY, VISION_WORKERS
+
+_vision_pool: Optional[ThreadPoolExecutor] = None
+_buffers = threading.local()  # one reusable JPEG buffer per pool thread
+
+prepare_latency = LatencyStat("vision_prepare")
+encode_latency = LatencyStat("vision_encode")
+payload_bytes = ValueStat("vision_payload_bytes")
+
+
+def get_vision_pool() -> ThreadPoolExecutor:
+    """Threads for frame preprocessing, started on the first camera question."""
+    global _vision_pool
+    if _vision_pool is None:
+        _vision_pool = ThreadPoolExecutor(max_workers=VISION_WORKERS, thread_name_prefix="vision")
+    return _vision_pool
+
+
+def shutdown_vision_pool():
+    global _vision_pool
+    if _vision_pool is not None:
+        _vision_pool.shutdown(wait=False, cancel_futures=True)
+        _vision_pool = None
+
+
+def reduce_factor(width: int, height: int, max_edge: int = VISION_MAX_EDGE) -> int:
+    """Smallest integer factor that brings the long edge to at most `max_edge` (1 = keep size)."""
+    long_edge = max(width, height)
+    if max_edge <= 0 or long_edge <= max_edge:
+        return 1
+    return -(-long_edge // max_edge)
+
+
+def prepare_rgb(width: int, height: int, data, max_edge: int = VISION_MAX_EDGE) -> Image.Image:
+    """RGB24 pixels -> image reduced to the model size."""
+    img = Image.frombuffer("RGB", (width, height), data, "raw", "RGB", 0, 1)
+    factor = reduce_factor(width, height, max_edge)
+    if factor > 1:
+        # integer box reduction: several times cheaper than a bilinear resize to the exact edge
+        img = img.reduce(factor)
+    return img
+
+
+def dhash(img: Image.Image, size: int = 8) -> int:
+    """Difference hash: size*size bits, one per horizontally adjacent pixel pair of a tiny grayscale copy."""
+    pixels = img.convert("L").resize((size + 1, size), Image.Resampling.BILINEAR).tobytes()
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def encode_image(img: Image.Image, quality: int = VISION_JPEG_QUALITY) -> str:
+    """
+    Image -> JPEG -> base64 string, ready for a data: URL.
+    Runs in a pool thread; the JPEG buffer of the thread is reused between frames.
+    """
+    buf = getattr(_buffers, "jpeg", None)
+    if buf is None:
+        buf = _buffers.jpeg = io.BytesIO()
+    buf.seek(0)
+    buf.truncate()
+    img.save(buf, format="JPEG", quality=quality)
+    return base64.b64encode(buf.getbuffer()).decode("ascii")
+
+
+def encode_rgb(
+    width: int,
+    height: int,
+    data,
+    max_edge: int = VISION_MAX_EDGE,
+    quality: int = VISION_JPEG_QUALITY,
+) -> str:
+    """RGB24 pixels -> downsampled base64 JPEG in one step."""
+    return encode_image(prepare_rgb(width, height, data, max_edge), quality)
+
+
+def _prepare_and_hash(frame: rtc.VideoFrame, max_edge: int) -> Tuple[Image.Image, int]:
+    # camera frames arrive as I420/NV12...: the full-size colour conversion runs here, in the pool thread
+    if frame.type != rtc.VideoBufferType.RGB24:
+        frame = frame.convert(rtc.VideoBufferType.RGB24)
+    img = prepare_rgb(frame.width, frame.height, frame.data, max_edge)
+    return img, dhash(img)
+
+
+async def prepare_frame_async(frame: rtc.VideoFrame, max_edge: int = VISION_MAX_EDGE) -> Tuple[Image.Image, int]:
+    """
+    Convert a camera frame to RGB24 and reduce it, off the event loop.
+    Returns the model-sized image and its dHash, so a cached answer can be found before encoding.
+    """
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    prepared = await loop.run_in_executor(get_vision_pool(), _prepare_and_hash, frame, max_edge)
+    prepare_latency.observe(time.perf_counter() - started)
+    return prepared
+
+
+async def encode_image_async(img: Image.Image, quality: int = VISION_JPEG_QUALITY) -> str:
+    """JPEG + base64 encode off the event loop."""
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    encoded = await loop.run_in_executor(get_vision_pool(), encode_image, img, quality)
+    encode_latency.observe(time.perf_counter() - started)
+    payload_bytes.observe(len(encoded))
+    logger.info(
+        f"Encoded {img.width}x{img.height} frame to {len(encoded) // 1024} KB "
+        f"in {(prepare_latency.last + encode_latency.last) * 1000:.1f} ms"
+    )
+    return encoded
+
+
+def stats() -> Dict:
+    return {
+        "prepare": prepare_latency.snapshot(),
+        "encode": encode_latency.snapshot(),
+        "payload_bytes": payload_bytes.snapshot(),
+    }
@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from logger import logger
+from intent_router import normalize
+from const import VISION_CACHE_MAX_ENTRIES, VISION_CACHE_TTL, VISION_HASH_MAX_DISTANCE
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class VisionAnswerCache:
+    """
+    In-memory cache of camera answers keyed by (dHash of the model-sized frame, normalized question).
+    A question asked again while the scene is static (hash within max_distance bits) is answered without
+    encoding the frame or calling the model. Entries expire after ttl seconds; the oldest entries are
+    evicted past max_entries.
+    """
+    def __init__(
+        self,
+        max_entries: int = VISION_CACHE_MAX_ENTRIES,
+        ttl: float = VISION_CACHE_TTL,
+        max_distance: int = VISION_HASH_MAX_DISTANCE,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[str, float]]" = OrderedDict()  # -> (answer, created)
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def _expire(self, now: float):
+        # insertion order is creation order: expired entries are at the front
+        while self._entries:
+            key, (_, created) = next(iter(self._entries.items()))
+            if now - created <= self.ttl:
+                break
+            del self._entries[key]
+            self.expired += 1
+
+    def get(self, frame_hash: int, question: str) -> Optional[str]:
+        now = time.monotonic()
+        self._expire(now)
+        question = normalize(question)
+        best: Optional[Tuple[int, Tuple[int, str]]] = None
+        for key in self._entries:
+            if key[1] != question:
+                continue
+            distance = hamming(key[0], frame_hash)
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, key)
+        if best is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        logger.info(f"Vision cache hit (hash distance {best[0]})")
+        return self._entries[best[1]][0]
+
+    def put(self, frame_hash: int, question: str, answer: str):
+        key = (frame_hash, normalize(question))
+        self._entries.pop(key, None)
+        self._entries[key] = (answer, time.monotonic())
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -26,7 +26,7 @@ namespace api.Controllers
 
         [HttpGet]
         [Authorize]
-        public async Task<IActionResult> GetConversationHistory([FromQuery] int? limit)
+        public async Task<IActionResult> GetConversationHistory([FromQuery] int? limit, [FromQuery] int? before, [FromQuery] int? since)
         {
             var userId = _userManager.GetUserId(User);
             if (string.IsNullOrEmpty(userId))
@@ -36,22 +36,19 @@ namespace api.Controllers
             if (history == null)
                 return Ok(new { Message = "No conversation history found for the user." });
 
-            var messages = await _messageRepository.GetAllByHistoryIdAsync(history.Id);
+            // Sort + limit trong database (index ConversationHistoryId, CreatedAt)
+            var messages = await _messageRepository.GetPageByHistoryIdAsync(history.Id, limit, before, since);
 
-            // Sort theo CreatedAt
-            messages = messages
-                .OrderBy(m => m.CreatedAt)
-                .ToList();
-
-            if (limit.HasValue)
-            {
-                messages = messages
-                    .TakeLast(limit.Value)   // chỉ lấy n message cuối
-                    .ToList();
-            }
+            // Same page as last time => 304, client reuses its copy
+            var etag = $"W/\"{history.Id}-{messages.Count}-{messages.FirstOrDefault()?.Id ?? 0}-{messages.LastOrDefault()?.Id ?? 0}\"";
+            Response.Headers.ETag = etag;
+            if (Request.Headers.IfNoneMatch.Contains(etag))
+                return StatusCode(StatusCodes.Status304NotModified);
 
             ConversationHistoryDto historyDto = history.ToDto();
             historyDto.Messages = messages.Select(m => m.ToDto()).ToList();
+            historyDto.OldestId = messages.FirstOrDefault()?.Id;
+            historyDto.NewestId = messages.LastOrDefault()?.Id;
 
             return Ok(historyDto);
         }
@@ -4,6 +4,7 @@ using api.Mappers;
 using api.Models;
 using Microsoft.AspNetCore.Mvc;
 using Microsoft.AspNetCore.Identity;
+using Microsoft.EntityFrameworkCore;
 
 namespace api.Controllers
 {
@@ -14,12 +15,14 @@ namespace api.Controllers
         private readonly IConversationHistoryRepository _conversationHistoryRepository;
         private readonly IMessageRepository _messageRepository;
         private readonly UserManager<User> _userManager;
+        private readonly IConfiguration _config;
 
-        public MessageController(IConversationHistoryRepository conversationHistoryRepository, IMessageRepository messageRepository, UserManager<User> userManager)
+        public MessageController(IConversationHistoryRepository conversationHistoryRepository, IMessageRepository messageRepository, UserManager<User> userManager, IConfiguration config)
         {
             _conversationHistoryRepository = conversationHistoryRepository;
             _messageRepository = messageRepository;
             _userManager = userManager;
+            _config = config;
         }
 
         [HttpPost]
@@ -60,5 +63,73 @@ namespace api.Controllers
             }
 
         }
+
+        // Bulk ingest for the agent worker: messages of many users, written in one transaction.
+        // Authenticated with the shared ingest key (Ingest:ApiKey) instead of a user token.
+        [HttpPost("bulk")]
+        public async Task<IActionResult> AddMessagesBulk([FromBody] List<UserMessagesDto> batch, [FromHeader(Name = "X-Ingest-Key")] string? ingestKey)
+        {
+            var expectedKey = _config["Ingest:ApiKey"];
+            if (string.IsNullOrEmpty(expectedKey) || ingestKey != expectedKey)
+            {
+                return Unauthorized();
+            }
+
+            if (!ModelState.IsValid)
+            {
+                return BadRequest(ModelState);
+            }
+
+            try
+            {
+                var usernames = batch.Select(b => b.Username).Distinct().ToList();
+                var users = await _userManager.Users
+                    .Where(u => usernames.Contains(u.UserName!))
+                    .Select(u => new { u.Id, u.UserName })
+                    .ToListAsync();
+                var userIdByName = users.ToDictionary(u => u.UserName!, u => u.Id);
+
+                var histories = await _conversationHistoryRepository.GetByUserIdsAsync(users.Select(u => u.Id).ToList());
+                var historyByUserId = histories.ToDictionary(h => h.UserId);
+
+                var result = new BulkMessageResultDto();
+                List<Message> messages = new List<Message>();
+                foreach (var group in batch.GroupBy(b => b.Username))
+                {
+                    if (!userIdByName.TryGetValue(group.Key, out var userId))
+                    {
+                        result.UnknownUsers.Add(group.Key);
+                        continue;
+                    }
+
+                    if (!historyByUserId.TryGetValue(userId, out var history))
+                    {
+                        // not saved yet: inserted together with its messages below
+                        history = new ConversationHistory
+                        {
+                            UserId = userId,
+                            CreatedAt = DateTime.Now
+                        };
+                        historyByUserId[userId] = history;
+                    }
+
+                    messages.AddRange(group.SelectMany(g => g.Messages).Select(m => m.ToModel(history.Id, history)));
+                    result.Users++;
+                }
+
+                if (messages.Count > 0)
+                {
+                    // one SaveChangesAsync => one transaction for the whole batch
+                    await _messageRepository.AddAsync(messages);
+                }
+
+                result.Accepted = messages.Count;
+                return Ok(result);
+            }
+            catch (Exception)
+            {
+                return StatusCode(500, "Internal server error");
+            }
+        }
     }
 }
\ No newline at end of file
@@ -6,5 +6,8 @@ namespace api.DTOs.ConversationHistory
     {
         public int Id { get; set; }
         public List<MessageDto> Messages { get; set; } = new List<MessageDto>();
+        // Cursors for the next request: ?before=OldestId for older pages, ?since=NewestId for new messages
+        public int? OldestId { get; set; }
+        public int? NewestId { get; set; }
     }
 }
\ No newline at end of file
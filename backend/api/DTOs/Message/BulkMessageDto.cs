@@ -0,0 +1,22 @@
+using System;
+using System.Collections.Generic;
+using System.ComponentModel.DataAnnotations;
+using System.Linq;
+using System.Threading.Tasks;
+
+namespace api.DTOs.Message
+{
+    public class UserMessagesDto
+    {
+        [Required]
+        public string Username { get; set; } = string.Empty;
+        public List<CreateMessageDto> Messages { get; set; } = new List<CreateMessageDto>();
+    }
+
+    public class BulkMessageResultDto
+    {
+        public int Accepted { get; set; }
+        public int Users { get; set; }
+        public List<string> UnknownUsers { get; set; } = new List<string>();
+    }
+}
@@ -43,6 +43,10 @@ namespace api.Data
                 .HasForeignKey(m => m.ConversationHistoryId)
                 .OnDelete(DeleteBehavior.Cascade);
 
+            // History pages are read newest-first per conversation (keyset on CreatedAt)
+            builder.Entity<Message>()
+                .HasIndex(m => new { m.ConversationHistoryId, m.CreatedAt });
+
             // Configure one-to-one relationship between User and ConversationHistory
             // Use ConversationHistory.UserId as the foreign key (dependent side)
             builder.Entity<User>()
@@ -11,6 +11,7 @@ namespace api.Interfaces
     {
         Task<ConversationHistory> GetByIdAsync(int id);
         Task<ConversationHistory> GetByUserIdAsync(string userId);
+        Task<List<ConversationHistory>> GetByUserIdsAsync(List<string> userIds);
         Task<ConversationHistory> CreateAsync(ConversationHistory history);
     }
 }
\ No newline at end of file
@@ -10,6 +10,7 @@ namespace api.Interfaces
     {
         Task<Message> GetByIdAsync(int id);
         Task<List<Message>> GetAllByHistoryIdAsync(int conversationHistoryId);
+        Task<List<Message>> GetPageByHistoryIdAsync(int conversationHistoryId, int? limit, int? beforeId, int? sinceId);
         Task<List<Message>> AddAsync(List<Message> messages);
     }
 }
\ No newline at end of file
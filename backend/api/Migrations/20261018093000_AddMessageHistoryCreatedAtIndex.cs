@@ -0,0 +1,36 @@
+﻿using Microsoft.EntityFrameworkCore.Migrations;
+
+#nullable disable
+
+namespace api.Migrations
+{
+    /// <inheritdoc />
+    public partial class AddMessageHistoryCreatedAtIndex : Migration
+    {
+        /// <inheritdoc />
+        protected override void Up(MigrationBuilder migrationBuilder)
+        {
+            migrationBuilder.DropIndex(
+                name: "IX_Messages_ConversationHistoryId",
+                table: "Messages");
+
+            migrationBuilder.CreateIndex(
+                name: "IX_Messages_ConversationHistoryId_CreatedAt",
+                table: "Messages",
+                columns: new[] { "ConversationHistoryId", "CreatedAt" });
+        }
+
+        /// <inheritdoc />
+        protected override void Down(MigrationBuilder migrationBuilder)
+        {
+            migrationBuilder.DropIndex(
+                name: "IX_Messages_ConversationHistoryId_CreatedAt",
+                table: "Messages");
+
+            migrationBuilder.CreateIndex(
+                name: "IX_Messages_ConversationHistoryId",
+                table: "Messages",
+                column: "ConversationHistoryId");
+        }
+    }
+}
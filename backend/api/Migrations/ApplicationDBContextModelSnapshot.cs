@@ -218,7 +218,7 @@ namespace api.Migrations
 
                     b.HasKey("Id");
 
-                    b.HasIndex("ConversationHistoryId");
+                    b.HasIndex("ConversationHistoryId", "CreatedAt");
 
                     b.ToTable("Messages");
                 });
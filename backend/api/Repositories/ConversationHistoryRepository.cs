@@ -37,5 +37,12 @@ namespace api.Repositories
                 .FirstOrDefaultAsync();
         }
 
+        public async Task<List<ConversationHistory>> GetByUserIdsAsync(List<string> userIds)
+        {
+            return await _context.ConversationHistories
+                .Where(x => userIds.Contains(x.UserId))
+                .ToListAsync();
+        }
+
     }
 }
\ No newline at end of file
@@ -30,6 +30,56 @@ namespace api.Repositories
                 .ToListAsync();
         }
 
+        // Keyset page ordered by (CreatedAt, Id), oldest first.
+        // beforeId: messages older than that message (the last `limit` of them);
+        // sinceId: messages newer than that message (the first `limit` of them).
+        public async Task<List<Message>> GetPageByHistoryIdAsync(int conversationHistoryId, int? limit, int? beforeId, int? sinceId)
+        {
+            var query = _context.Messages
+                .AsNoTracking()
+                .Where(x => x.ConversationHistoryId == conversationHistoryId);
+
+            if (beforeId.HasValue)
+            {
+                var cursor = await _context.Messages
+                    .Where(x => x.Id == beforeId.Value && x.ConversationHistoryId == conversationHistoryId)
+                    .Select(x => new { x.Id, x.CreatedAt })
+                    .FirstOrDefaultAsync();
+                if (cursor == null)
+                    return new List<Message>();
+                query = query.Where(x => x.CreatedAt < cursor.CreatedAt || (x.CreatedAt == cursor.CreatedAt && x.Id < cursor.Id));
+            }
+
+            if (sinceId.HasValue)
+            {
+                var cursor = await _context.Messages
+                    .Where(x => x.Id == sinceId.Value && x.ConversationHistoryId == conversationHistoryId)
+                    .Select(x => new { x.Id, x.CreatedAt })
+                    .FirstOrDefaultAsync();
+                if (cursor != null)
+                    query = query.Where(x => x.CreatedAt > cursor.CreatedAt || (x.CreatedAt == cursor.CreatedAt && x.Id > cursor.Id));
+
+                var newer = query.OrderBy(x => x.CreatedAt).ThenBy(x => x.Id);
+                return limit.HasValue
+                    ? await newer.Take(limit.Value).ToListAsync()
+                    : await newer.ToListAsync();
+            }
+
+            if (!limit.HasValue)
+            {
+                return await query.OrderBy(x => x.CreatedAt).ThenBy(x => x.Id).ToListAsync();
+            }
+
+            // newest `limit` rows from the index, then back to chronological order
+            var page = await query
+                .OrderByDescending(x => x.CreatedAt)
+                .ThenByDescending(x => x.Id)
+                .Take(limit.Value)
+                .ToListAsync();
+            page.Reverse();
+            return page;
+        }
+
         public async Task<List<Message>> AddAsync(List<Message> messages)
         {
             await _context.Messages.AddRangeAsync(messages);